@@ -0,0 +1,310 @@
+import argparse
+import os
+import subprocess
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from urllib.parse import quote_plus
+import logging
+from tqdm import tqdm
+from mutagen import File as MutagenFile
+from mutagen.mp4 import MP4
+from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3NoHeaderError
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+import tempfile
+import time
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.FileHandler('audiobook_organizer.log'), logging.StreamHandler()]
+)
+
+# One keep-alive session for all lookups: saves DNS/TCP/TLS setup per request
+HTTP_TIMEOUT = (5, 30)
+session = requests.Session()
+session.headers['User-Agent'] = 'Mozilla/5.0'
+_adapter = HTTPAdapter(pool_maxsize=8, pool_block=True, max_retries=Retry(
+    total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({'GET', 'HEAD'}), respect_retry_after_header=True))
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+
+def print_dir_tree(directory, label):
+    logging.info(f"{label}:")
+    for root, dirs, files in os.walk(directory):
+        level = root.replace(directory, '').count(os.sep)
+        indent = ' ' * 4 * level
+        logging.info(f"{indent}{os.path.basename(root)}/")
+        subindent = ' ' * 4 * (level + 1)
+        for f in files:
+            logging.info(f"{subindent}{f}")
+
+def count_audio_files(folder):
+    mp3_count = len([f for f in os.listdir(folder) if f.lower().endswith('.mp3')])
+    m4b_count = len([f for f in os.listdir(folder) if f.lower().endswith('.m4b')])
+    return mp3_count, m4b_count
+
+def read_file_tags(file_path):
+    try:
+        if file_path.lower().endswith('.mp3'):
+            audio = EasyID3(file_path)
+            title = audio['album'][0] if 'album' in audio else (audio['title'][0] if 'title' in audio else None)
+            author = audio['artist'][0] if 'artist' in audio else None
+            return title, author
+    except (ID3NoHeaderError, Exception):
+        pass
+    return None, None
+
+def extract_meta_from_files(folder, tag_readers=8):
+    titles = []
+    authors = []
+    files = os.listdir(folder)
+    # Tag reads are dominated by filesystem latency, so overlap them
+    with ThreadPoolExecutor(max_workers=max(1, tag_readers)) as pool:
+        for title, author in pool.map(read_file_tags, [os.path.join(folder, f) for f in files]):
+            if title:
+                titles.append(title)
+            if author:
+                authors.append(author)
+    most_common_title = Counter(titles).most_common(1)
+    most_common_author = Counter(authors).most_common(1)
+    meta = {
+        'title': most_common_title[0][0] if most_common_title else None,
+        'author': most_common_author[0][0] if most_common_author else None
+    }
+    # Ignore if title looks like chapter
+    if meta['title'] and meta['title'].lower().startswith('chapter '):
+        meta['title'] = None
+    # Fallback to folder path or name
+    if not meta['title'] or not meta['author']:
+        rel_path = folder.replace('/opt/sort/', '')
+        parts = rel_path.split('/')
+        if len(parts) >= 2:
+            meta['author'] = meta['author'] or parts[0]
+            meta['title'] = meta['title'] or ' '.join(parts[1:])
+        elif files:
+            first_file = os.path.join(folder, files[0])
+            base_name = os.path.basename(first_file).rsplit('.', 1)[0]
+            base_parts = base_name.split(' - ')
+            if len(base_parts) >= 2:
+                meta['author'] = meta['author'] or base_parts[0].strip()
+                meta['title'] = meta['title'] or ' - '.join(base_parts[1:]).strip()
+    return meta
+
+def find_asin(folder_name, title=None, author=None):
+    try:
+        if title and (author and author != 'Unknown'):
+            query = quote_plus(f"{title} {author} audiobook")
+        elif title:
+            query = quote_plus(f"{title} audiobook")
+        else:
+            parts = folder_name.split(' - ')
+            if len(parts) < 2: return None
+            author = parts[0].strip()
+            title = ' - '.join(parts[1:]).strip()
+            query = quote_plus(f"{title} {author} audiobook")
+        url = f"https://www.audible.com/search?keywords={query}"
+        response = session.get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, 'html.parser')
+        first_link = soup.find('a', class_='bc-link', href=lambda h: h and '/pd/' in h)
+        if first_link:
+            return first_link['href'].split('/')[-1].split('?')[0]
+        return None
+    except: return None
+
+def fetch_cover_url(title, author):
+    try:
+        query = quote_plus(f"{title} {author}")
+        url = f"https://openlibrary.org/search.json?q={query}"
+        response = session.get(url, timeout=HTTP_TIMEOUT)
+        data = response.json()
+        if data['num_found'] > 0:
+            olid = data['docs'][0].get('cover_edition_key')
+            if olid: return f"https://covers.openlibrary.org/b/olid/{olid}-L.jpg"
+        return None
+    except: return None
+
+def embed_cover(m4b_file, cover_url):
+    try:
+        cover_data = session.get(cover_url, timeout=HTTP_TIMEOUT).content
+        audio = MP4(m4b_file)
+        audio['covr'] = [cover_data]
+        audio.save()
+    except: pass
+
+def has_cover(m4b_file):
+    try:
+        audio = MP4(m4b_file)
+        return 'covr' in audio and len(audio['covr']) > 0
+    except: return False
+
+def pre_process_chapters(folder):
+    try:
+        mp3_files = sorted([f for f in os.listdir(folder) if f.lower().endswith('.mp3')])
+        for i, file in enumerate(mp3_files, start=1):
+            old_path = os.path.join(folder, file)
+            chapter_name = f"Chapter {i:02d}.mp3"
+            new_path = os.path.join(folder, chapter_name)
+            os.rename(old_path, new_path)
+            try:
+                audio = EasyID3(new_path)
+                audio['title'] = f"Chapter {i:02d}"
+                audio.save()
+            except: pass
+    except: pass
+
+# Named ffmpeg AAC settings (same as organizer/encoder_profiles.py in the web app)
+ENCODER_PROFILES = {
+    'fast': ['-c:a', 'aac', '-aac_coder', 'fast', '-b:a', '64k', '-ac', '1'],
+    'standard': ['-c:a', 'aac', '-b:a', '64k'],
+    'archive': ['-c:a', 'aac', '-aac_coder', 'twoloop', '-b:a', '128k', '-ac', '2'],
+}
+
+def escape_ffmetadata(value):
+    """Escape a value for an FFMETADATA file, where = ; # \\ and newlines are special."""
+    for ch in ('\\', '=', ';', '#', '\n'):
+        value = str(value).replace(ch, '\\' + ch)
+    return value
+
+def ffmpeg_convert(folder, output_file, title, author, profile):
+    """Concat the folder's MP3s into one M4B with per-file chapters, encoded with `profile`."""
+    mp3_files = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith('.mp3'))
+    with tempfile.TemporaryDirectory() as tmp:
+        list_file = os.path.join(tmp, 'inputs.txt')
+        meta_file = os.path.join(tmp, 'metadata.txt')
+        with open(list_file, 'w') as f:
+            for path in mp3_files:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        with open(meta_file, 'w') as f:
+            title, author = escape_ffmetadata(title), escape_ffmetadata(author)
+            f.write(f";FFMETADATA1\ntitle={title}\nalbum={title}\nartist={author}\ngenre=Audiobook\n")
+            start = 0
+            for path in mp3_files:
+                end = start + int(MutagenFile(path).info.length * 1000)
+                f.write(f"[CHAPTER]\nTIMEBASE=1/1000\nSTART={start}\nEND={end}\ntitle={escape_ffmetadata(os.path.splitext(os.path.basename(path))[0])}\n")
+                start = end
+        cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-y', '-f', 'concat', '-safe', '0', '-i', list_file,
+               '-f', 'ffmetadata', '-i', meta_file, '-map', '0:a', '-map_metadata', '1', '-map_chapters', '1',
+               *ENCODER_PROFILES[profile], '-movflags', '+faststart', '-f', 'ipod', output_file]
+        subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+def benchmark_profiles(sample):
+    """Encode `sample` with every profile and report speed as a multiple of real time."""
+    length = MutagenFile(sample).info.length
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, audio_args in ENCODER_PROFILES.items():
+            dest = os.path.join(tmp, f"{name}.m4a")
+            started = time.perf_counter()
+            subprocess.run(['ffmpeg', '-hide_banner', '-nostdin', '-y', '-i', sample, '-map', '0:a',
+                            *audio_args, '-f', 'ipod', dest], capture_output=True, check=True)
+            elapsed = time.perf_counter() - started
+            print(f"{name:10s} {length / elapsed:8.1f}x real time  {os.path.getsize(dest) / 1024:10.0f} KiB")
+
+def find_audiobook_folders(root_path):
+    candidates = []
+    for item in sorted(os.listdir(root_path)):
+        full_path = os.path.join(root_path, item)
+        if os.path.isdir(full_path):
+            first_root = full_path
+            break
+    if first_root:
+        logging.info(f"Processing only first root folder: {first_root}")
+        for root, dirs, files in os.walk(first_root):
+            logging.info(f"In {root}, dirs: {dirs}")
+            mp3_count = sum(1 for f in files if f.lower().endswith('.mp3'))
+            logging.info(f"Checking root: {root}, MP3 count: {mp3_count}")
+            if mp3_count > 1:
+                candidates.append(root)
+    logging.info(f"Found subfolders with MP3s: {candidates}")
+    return candidates
+
+parser = argparse.ArgumentParser(description='Audiobook Organizer CLI')
+parser.add_argument('--m4binder_path', help='Path to m4binder.py')
+parser.add_argument('--tag-readers', type=int, default=8, help='Threads used to read tags per folder')
+parser.add_argument('--profile', choices=sorted(ENCODER_PROFILES),
+                    help='Encode with ffmpeg using this profile instead of m4b-merge/m4binder')
+parser.add_argument('--benchmark', metavar='SAMPLE', help='Time each encoder profile on an audio file and exit')
+args = parser.parse_args()
+
+if args.benchmark:
+    benchmark_profiles(args.benchmark)
+    raise SystemExit(0)
+if not args.m4binder_path:
+    parser.error('--m4binder_path is required')
+
+root_path = '/opt/sort'
+output_path = '/opt/done'
+m4binder_path = args.m4binder_path
+archive_path = os.path.join(root_path, 'processed_archive')
+os.makedirs(archive_path, exist_ok=True)
+os.makedirs(output_path, exist_ok=True)
+
+print_dir_tree(root_path, "Before")
+
+folders = find_audiobook_folders(root_path)
+
+for folder in tqdm(folders, desc="Processing folders"):
+    folder_name = os.path.basename(folder)
+    logging.info(f"Processing folder: {folder}")
+    mp3_count, m4b_count = count_audio_files(folder)
+    logging.info(f"Original counts: MP3={mp3_count}, M4B={m4b_count}")
+    if mp3_count <= 1:
+        logging.info("Skipping: Insufficient MP3 files")
+        continue
+    meta = extract_meta_from_files(folder, args.tag_readers)
+    logging.info(f"Extracted meta: title={meta['title']}, author={meta['author']}")
+    parts = folder_name.split(' - ')
+    author = meta['author'] or (parts[0].strip() if len(parts) > 1 else 'Unknown')
+    title = meta['title'] or (' - '.join(parts[1:]).strip() if len(parts) > 1 else folder_name)
+    logging.info(f"Using title={title}, author={author}")
+    pre_process_chapters(folder)
+    asin = find_asin(folder_name, title, author)
+    logging.info(f"Found ASIN: {asin}")
+    success = False
+    output_file = os.path.join(output_path, f"{author} - {title}.m4b")
+    if args.profile:
+        try:
+            ffmpeg_convert(folder, output_file, title, author, args.profile)
+            success = True
+        except subprocess.CalledProcessError as e:
+            logging.error(f"ffmpeg ({args.profile}) failed for {folder_name}: {e.stderr}")
+        except Exception as e:
+            logging.error(f"ffmpeg exception for {folder_name}: {str(e)}")
+    if asin and not success:
+        try:
+            proc = subprocess.Popen(['m4b-merge', '-i', folder, '-o', output_path], stdin=subprocess.PIPE, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = proc.communicate(input=asin + '\n')
+            if proc.returncode == 0:
+                success = True
+            else:
+                logging.error(f"m4b-merge failed for {folder_name}: {stderr}")
+        except Exception as e:
+            logging.error(f"m4b-merge exception for {folder_name}: {str(e)}")
+    if not success:
+        try:
+            result = subprocess.run(['python3', m4binder_path, '--mode', 'single', '--input-folder', folder,
+                                    '--output-file', output_file, '--metadata-source', 'openlibrary',
+                                    '--title', title, '--author', author], capture_output=True, text=True, check=True)
+            success = True
+        except subprocess.CalledProcessError as e:
+            logging.error(f"m4binder failed for {folder_name}: {e.stderr}")
+        except Exception as e:
+            logging.error(f"m4binder exception for {folder_name}: {str(e)}")
+    if success:
+        if not has_cover(output_file):
+            cover_url = fetch_cover_url(title, author)
+            if cover_url: embed_cover(output_file, cover_url)
+        logging.info(f"Created M4B: {output_file}")
+        archive_folder = os.path.join(archive_path, folder_name)
+        shutil.move(folder, archive_folder)
+    else:
+        logging.warning(f"Failed: {folder_name}")
+
+print_dir_tree(output_path, "After")
@@ -0,0 +1,73 @@
+import logging
+import threading
+
+from django.db import connection
+
+from organizer.models import Log
+
+logger = logging.getLogger(__name__)
+
+
+class JobLogWriter:
+    """
+    Buffers a job's Log rows and inserts them with bulk_create, once
+    `batch_size` rows are pending or at most `flush_seconds` after a row
+    was added, and when the writer is closed. Use as a context manager:
+    that starts the background thread doing the timed flushes, and writes
+    the tail of the buffer even if the job fails.
+
+    Safe to call from several threads (e.g. pipeline stages).
+    """
+
+    def __init__(self, job_id, batch_size=50, flush_seconds=2.0):
+        self.job_id = job_id
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(0.1, flush_seconds)
+        self._rows = []
+        self._lock = threading.Lock()
+        # Held while inserting, so rows get their ids in the order they were added
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"job-log-{self.job_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the flush thread and write what is still buffered."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.flush_seconds):
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Could not write log rows of job %s", self.job_id)
+        finally:
+            connection.close()  # this thread's own DB connection
+
+    def add(self, message, book='', stage='', duration=None):
+        row = Log(job_id=self.job_id, message=message, book=book, stage=stage, duration=duration)
+        with self._lock:
+            self._rows.append(row)
+            due = len(self._rows) >= self.batch_size
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if rows:
+                Log.objects.bulk_create(rows, batch_size=self.batch_size)
@@ -93,3 +93,62 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Runtime state shared by the web and worker containers (the /config volume)
+AUTOBOOK_CONFIG_DIR = os.environ.get('AUTOBOOK_CONFIG_DIR', '/config')
+
+# Job pipeline concurrency (see organizer.pipeline.PipelineLimits)
+AUTOBOOK_CONVERT_SLOTS = int(os.environ.get('AUTOBOOK_CONVERT_SLOTS', max(1, (os.cpu_count() or 1) // 2)))
+AUTOBOOK_METADATA_SLOTS = int(os.environ.get('AUTOBOOK_METADATA_SLOTS', 8))
+AUTOBOOK_LAYOUT_WORKERS = int(os.environ.get('AUTOBOOK_LAYOUT_WORKERS', 2))
+AUTOBOOK_ARCHIVE_WORKERS = int(os.environ.get('AUTOBOOK_ARCHIVE_WORKERS', 1))
+AUTOBOOK_STAGE_BUFFER = int(os.environ.get('AUTOBOOK_STAGE_BUFFER', 4))
+# ffmpeg processes per conversion when transcoding MP3 books segment by segment
+AUTOBOOK_SEGMENT_WORKERS = int(os.environ.get('AUTOBOOK_SEGMENT_WORKERS', max(1, (os.cpu_count() or 1) // AUTOBOOK_CONVERT_SLOTS)))
+# Host-wide encoder slots shared by all workers through lock files (organizer.encoder_slots);
+# the lock dir must be on a volume shared by the worker containers. 0 disables.
+AUTOBOOK_ENCODER_SLOTS = int(os.environ.get('AUTOBOOK_ENCODER_SLOTS', os.cpu_count() or 1))
+AUTOBOOK_ENCODER_LOCK_DIR = os.environ.get('AUTOBOOK_ENCODER_LOCK_DIR', os.path.join(AUTOBOOK_CONFIG_DIR, 'encoder-slots'))
+# Threads per ffmpeg process; 0 lets ffmpeg decide
+AUTOBOOK_FFMPEG_THREADS = int(os.environ.get('AUTOBOOK_FFMPEG_THREADS', 1))
+# Dispatch one Celery task per book (chord) instead of processing in-task
+AUTOBOOK_FANOUT = os.environ.get('AUTOBOOK_FANOUT', '1').lower() not in ('0', 'false', 'no')
+
+# Persistent scan index (organizer.scan_index.ScanIndex); set to '' to disable
+AUTOBOOK_SCAN_INDEX = os.environ.get('AUTOBOOK_SCAN_INDEX', os.path.join(AUTOBOOK_CONFIG_DIR, 'scan_index.sqlite3'))
+# Threads reading tags during a scan; raise for high-latency network shares
+AUTOBOOK_TAG_READERS = int(os.environ.get('AUTOBOOK_TAG_READERS', 16))
+# What to do with books already in the output library: skip, replace or version
+AUTOBOOK_LIBRARY_POLICY = os.environ.get('AUTOBOOK_LIBRARY_POLICY', 'skip')
+# Per-book stage checkpoints so retried jobs skip finished work (organizer.checkpoints); '' disables
+AUTOBOOK_CHECKPOINTS = os.environ.get('AUTOBOOK_CHECKPOINTS', os.path.join(AUTOBOOK_CONFIG_DIR, 'checkpoints.sqlite3'))
+
+# Shared HTTP client for metadata providers (organizer.http_client)
+AUTOBOOK_HTTP_CONNECTIONS_PER_HOST = int(os.environ.get('AUTOBOOK_HTTP_CONNECTIONS_PER_HOST', 8))
+AUTOBOOK_HTTP_RETRIES = int(os.environ.get('AUTOBOOK_HTTP_RETRIES', 3))
+AUTOBOOK_HTTP_TIMEOUT = float(os.environ.get('AUTOBOOK_HTTP_TIMEOUT', 30))
+
+# On-disk metadata lookup cache (organizer.metadata_cache); set to '' to disable
+AUTOBOOK_METADATA_CACHE = os.environ.get('AUTOBOOK_METADATA_CACHE', os.path.join(AUTOBOOK_CONFIG_DIR, 'metadata_cache.sqlite3'))
+AUTOBOOK_METADATA_CACHE_TTL = float(os.environ.get('AUTOBOOK_METADATA_CACHE_TTL', 30 * 24 * 3600))
+AUTOBOOK_METADATA_CACHE_NEGATIVE_TTL = float(os.environ.get('AUTOBOOK_METADATA_CACHE_NEGATIVE_TTL', 24 * 3600))
+AUTOBOOK_METADATA_CACHE_MAX_ENTRIES = int(os.environ.get('AUTOBOOK_METADATA_CACHE_MAX_ENTRIES', 50000))
+
+# Per-provider request rates in requests/second (organizer.rate_limit); 0 = unlimited.
+# Set AUTOBOOK_RATE_LIMIT_REDIS to share the buckets across all worker containers.
+AUTOBOOK_PROVIDER_QPS = {
+    'google_books': float(os.environ.get('AUTOBOOK_QPS_GOOGLE_BOOKS', 2)),
+    'audible_asin': float(os.environ.get('AUTOBOOK_QPS_AUDIBLE_SEARCH', 1)),
+    'audible_api': float(os.environ.get('AUTOBOOK_QPS_AUDIBLE_API', 2)),
+    'openlibrary_cover': float(os.environ.get('AUTOBOOK_QPS_OPENLIBRARY', 2)),
+}
+AUTOBOOK_RATE_LIMIT_BURST = float(os.environ.get('AUTOBOOK_RATE_LIMIT_BURST', 2))
+AUTOBOOK_RATE_LIMIT_REDIS = os.environ.get('AUTOBOOK_RATE_LIMIT_REDIS', '')
+
+# Content-addressed cover image cache (organizer.cover_cache); covers are downscaled to fit
+AUTOBOOK_COVER_CACHE = os.environ.get('AUTOBOOK_COVER_CACHE', os.path.join(AUTOBOOK_CONFIG_DIR, 'cover_cache'))
+AUTOBOOK_COVER_MAX_DIMENSION = int(os.environ.get('AUTOBOOK_COVER_MAX_DIMENSION', 1000))
+
+# Job log rows are buffered and bulk-inserted (autobook.job_log.JobLogWriter)
+AUTOBOOK_LOG_BATCH_SIZE = int(os.environ.get('AUTOBOOK_LOG_BATCH_SIZE', 50))
+AUTOBOOK_LOG_FLUSH_SECONDS = float(os.environ.get('AUTOBOOK_LOG_FLUSH_SECONDS', 2))
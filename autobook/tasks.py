@@ -1,19 +1,132 @@
 import os
 import logging
+import time
+from contextlib import nullcontext
 
-from celery import shared_task
+from celery import shared_task, chord
+from django.conf import settings
 
-from organizer.utils import scan_audiobook_folders, process_audiobook_folder
+from organizer.utils import (
+    BookWork, book_metadata, book_stages, enrich_books, iter_book_candidates, iter_unique_candidates,
+    process_audiobook_folder,
+)
+from organizer.pipeline import PipelineLimits, run_stages
+from organizer.scan_index import ScanIndex
+from organizer.checkpoints import BookCheckpoint, CheckpointStore
+from organizer import cover_cache, encoder_slots, http_client, metadata_cache, muxer, rate_limit
 from organizer.models import Job, Log
 
+from .job_log import JobLogWriter
+
 logger = logging.getLogger(__name__)
 
+http_client.configure(
+    per_host_connections=settings.AUTOBOOK_HTTP_CONNECTIONS_PER_HOST,
+    retries=settings.AUTOBOOK_HTTP_RETRIES,
+    timeout=(5.0, settings.AUTOBOOK_HTTP_TIMEOUT),
+)
+metadata_cache.configure(
+    settings.AUTOBOOK_METADATA_CACHE,
+    ttl=settings.AUTOBOOK_METADATA_CACHE_TTL,
+    negative_ttl=settings.AUTOBOOK_METADATA_CACHE_NEGATIVE_TTL,
+    max_entries=settings.AUTOBOOK_METADATA_CACHE_MAX_ENTRIES,
+)
+rate_limit.configure(
+    settings.AUTOBOOK_PROVIDER_QPS,
+    redis_url=settings.AUTOBOOK_RATE_LIMIT_REDIS or None,
+    burst=settings.AUTOBOOK_RATE_LIMIT_BURST,
+)
+encoder_slots.configure(settings.AUTOBOOK_ENCODER_LOCK_DIR, settings.AUTOBOOK_ENCODER_SLOTS)
+muxer.configure(threads=settings.AUTOBOOK_FFMPEG_THREADS)
+cover_cache.configure(settings.AUTOBOOK_COVER_CACHE, settings.AUTOBOOK_COVER_MAX_DIMENSION)
+
+
+def _pipeline_limits():
+    return PipelineLimits(
+        convert_slots=settings.AUTOBOOK_CONVERT_SLOTS,
+        metadata_slots=settings.AUTOBOOK_METADATA_SLOTS,
+        layout_workers=settings.AUTOBOOK_LAYOUT_WORKERS,
+        archive_workers=settings.AUTOBOOK_ARCHIVE_WORKERS,
+        segment_workers=settings.AUTOBOOK_SEGMENT_WORKERS,
+        buffer_size=settings.AUTOBOOK_STAGE_BUFFER,
+    )
+
+
+def _scan(input_path):
+    """Stream BookCandidates from the input path as they are grouped (duplicates included)."""
+    tag_readers = settings.AUTOBOOK_TAG_READERS
+    if not settings.AUTOBOOK_SCAN_INDEX:
+        yield from iter_book_candidates(input_path, tag_readers=tag_readers)
+        return
+    with ScanIndex(settings.AUTOBOOK_SCAN_INDEX) as index:
+        yield from iter_book_candidates(input_path, index=index, tag_readers=tag_readers)
+
+
+def _checkpoints():
+    """Context manager yielding the CheckpointStore, or None when disabled."""
+    if not settings.AUTOBOOK_CHECKPOINTS:
+        return nullcontext(None)
+    return CheckpointStore(settings.AUTOBOOK_CHECKPOINTS)
+
+
+def _book_checkpoint(store, job_id, folder):
+    return store.book(job_id, folder) if store is not None else BookCheckpoint(folder)
+
+
+def _book_message(folder, success, error=None):
+    msg = f"{os.path.basename(folder)}: {'Success' if success else 'Failed'}"
+    if error:
+        msg = f"{msg} ({error})"
+    return msg
+
+
+def _log_writer(job_id):
+    return JobLogWriter(
+        job_id,
+        batch_size=settings.AUTOBOOK_LOG_BATCH_SIZE,
+        flush_seconds=settings.AUTOBOOK_LOG_FLUSH_SECONDS,
+    )
+
+
+def _finish_job(job, errors, log=None):
+    if errors:
+        message = f"{len(errors)} book(s) raised errors; first: {errors[0]}"
+        if log is not None:
+            log.add(message, stage='job')
+        else:
+            Log.objects.create(job=job, message=message, stage='job')
+    if log is not None:
+        log.flush()  # all rows are visible before the final status
+    job.status = "failed" if errors else "completed"
+    job.save()
+    if not errors:
+        with _checkpoints() as store:
+            if store is not None:
+                store.clear(job.id)
+    return job.status
+
 
 @shared_task(bind=True, max_retries=3)
 def process_job(self, job_id, input_path, output_path):
     """
-    Background job that scans the input path, processes each audiobook folder,
-    and records basic logs in the database.
+    Background job that scans the input path and processes every audiobook
+    folder, recording basic logs in the database.
+
+    With AUTOBOOK_FANOUT enabled (the default) the scanned books are
+    enriched in one batch (organizer.utils.enrich_books) and each becomes its own
+    `process_book` task in a chord whose callback, `finalize_job`, sets the
+    final job status; books are spread across all Celery workers and retry
+    independently. Otherwise the books run through an in-task staged pipeline
+    (scan -> enrich -> convert -> cover/layout -> archive, see
+    organizer.pipeline.run_stages and organizer.utils.book_stages) with
+    bounded queues between stages, so the first books are converted while
+    the scan is still running.
+
+    Copies of a book already seen in the scan (same content digest) are
+    archived instead of converted.
+
+    Each book's progress is checkpointed (organizer.checkpoints), so a
+    retried job reuses earlier metadata and skips finished conversions.
 
     WebSocket / Channels integration is intentionally disabled for now to
     avoid import/version issues during migrations.
@@ -23,28 +136,117 @@ def process_job(self, job_id, input_path, output_path):
     job.status = "processing"
     job.save()
 
-    try:
-        folders = scan_audiobook_folders(input_path)
-        total = len(folders) or 1
+    log = _log_writer(job_id)
 
-        for i, folder in enumerate(folders):
-            success = process_audiobook_folder(folder, output_path)
+    def duplicate(candidate, original):
+        book = os.path.basename(str(candidate.source_dir))
+        log.add(
+            f"{book}: Duplicate of {os.path.basename(str(original.source_dir))}, archived",
+            book=book, stage='scan',
+        )
 
-            msg = f"{os.path.basename(folder)}: {'Success' if success else 'Failed'}"
-            logger.info("[job %s] %s", job_id, msg)
+    try:
+        with log, _checkpoints() as store:
+            scanned = iter_unique_candidates(_scan(input_path), output_path, on_duplicate=duplicate)
+            if settings.AUTOBOOK_FANOUT:
+                candidates = list(scanned)
+                if not candidates:
+                    return _finish_job(job, [], log)
+                metadata = {}
+                pending = []
+                for candidate in candidates:
+                    folder = str(candidate.source_dir)
+                    checkpoint = _book_checkpoint(store, job_id, folder)
+                    checkpoint.mark('scanned')
+                    if checkpoint.reached('enriched'):
+                        metadata[folder] = checkpoint.data['metadata']
+                    else:
+                        pending.append(candidate)
+                # One batched, de-duplicated enrichment pass for the books not enriched yet
+                for book in enrich_books(pending, workers=settings.AUTOBOOK_METADATA_SLOTS):
+                    metadata[str(book.candidate.source_dir)] = book_metadata(book)
+                chord(
+                    process_book.s(
+                        job_id, str(candidate.source_dir), output_path,
+                        metadata[str(candidate.source_dir)], job.encoder_profile,
+                    )
+                    for candidate in candidates
+                )(finalize_job.s(job_id))
+                return job.status
 
-            Log.objects.create(
-                job=job,
-                message=msg,
+            errors = []
+            limits = _pipeline_limits()
+            works = (
+                BookWork(candidate, checkpoint=_book_checkpoint(store, job_id, str(candidate.source_dir)))
+                for candidate in scanned
             )
 
-        job.status = "completed"
-        job.save()
-        return job.status
+            stages = book_stages(output_path, limits, job.encoder_profile, settings.AUTOBOOK_LIBRARY_POLICY)
+            for result in run_stages(works, stages, limits.buffer_size):
+                work = result.item
+                msg = _book_message(work.folder, work.success, result.error)
+                if result.error:
+                    errors.append(result.error)
+                logger.info("[job %s] %s", job_id, msg)
+                log.add(
+                    msg,
+                    book=os.path.basename(work.folder),
+                    stage=result.stage or 'done',
+                    duration=round(work.elapsed, 3),
+                )
+
+            return _finish_job(job, errors, log)
 
     except Exception as exc:
         logger.exception("Job %s failed: %s", job_id, exc)
-        job.status = "failed"
+        # "failed" is final for the results page, so only set it once retries are used up
+        job.status = "retrying" if self.request.retries < self.max_retries else "failed"
         job.save()
-        Log.objects.create(job=job, message=str(exc))
+        Log.objects.create(job=job, message=str(exc), stage='job')
         raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_book(self, job_id, folder, output_path, metadata=None, encoder_profile=None):
+    """
+    Chord member: process a single candidate folder of a job, using the
+    metadata found by the job's batch enrichment when given.
+
+    Errors are retried for this book only, resuming from its last
+    checkpointed stage. Once retries are exhausted the
+    failure is returned rather than raised, so the chord callback still
+    runs and can account for it.
+    """
+    error = None
+    started = time.monotonic()
+    try:
+        with _checkpoints() as store:
+            success = process_audiobook_folder(
+                folder, output_path, metadata=metadata, segment_workers=settings.AUTOBOOK_SEGMENT_WORKERS,
+                encoder_profile=encoder_profile, checkpoint=_book_checkpoint(store, job_id, folder),
+                library_policy=settings.AUTOBOOK_LIBRARY_POLICY,
+            )
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            logger.warning("[job %s] %s failed, retrying: %s", job_id, folder, exc)
+            raise self.retry(exc=exc)
+        logger.exception("[job %s] %s failed permanently", job_id, folder)
+        success = False
+        error = str(exc) or exc.__class__.__name__
+
+    msg = _book_message(folder, success, error)
+    logger.info("[job %s] %s", job_id, msg)
+    # One row per task, so there is nothing to batch here
+    Log.objects.create(
+        job_id=job_id, message=msg, book=os.path.basename(folder),
+        stage='done' if success else 'failed', duration=round(time.monotonic() - started, 3),
+    )
+    return {'folder': folder, 'success': success, 'error': error}
+
+
+@shared_task
+def finalize_job(results, job_id):
+    """Chord callback: mark the job completed, or failed if any book errored."""
+    job = Job.objects.get(id=job_id)
+    errors = [r['error'] for r in results if r and r.get('error')]
+    return _finish_job(job, errors)
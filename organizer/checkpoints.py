@@ -0,0 +1,172 @@
+"""
+Per-book progress of a job, so a retried or resumed job skips work that
+already finished.
+
+Each (job, book folder) pair records the last completed stage out of
+STAGES plus a small JSON payload (the enrichment metadata, the converted
+file). Stages only ever move forward.
+
+The store also hands out claims on output files, so two books of the same
+or of concurrent jobs never convert to the same target at once.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+import json
+import sqlite3
+import threading
+import time
+
+STAGES = ("scanned", "enriched", "converted", "finalized", "archived")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, folder)
+);
+CREATE TABLE IF NOT EXISTS claims (
+    target TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    claimed_at REAL NOT NULL
+);
+"""
+
+# Claims left behind by a crashed worker are taken over after this long
+CLAIM_TTL = 12 * 3600
+
+# Claims of BookCheckpoints without a store, valid within this process only
+_local_claims: Dict[str, str] = {}
+_local_claims_lock = threading.Lock()
+
+
+class ClaimError(RuntimeError):
+    """An output file is claimed by another book that has not finished it yet."""
+
+
+def _rank(stage: Optional[str]) -> int:
+    return STAGES.index(stage) if stage else -1
+
+
+class CheckpointStore:
+    """SQLite-backed checkpoints; safe to share between threads and processes."""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "CheckpointStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def load(self, job_id, folder: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stage, data FROM checkpoints WHERE job_id = ? AND folder = ?",
+                (str(job_id), folder),
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, {})
+
+    def save(self, job_id, folder: str, stage: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, folder, stage, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(job_id), folder, stage, json.dumps(data), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self, job_id) -> None:
+        """Forget a job's checkpoints and claims, e.g. once it completed."""
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (str(job_id),))
+            self._conn.execute("DELETE FROM claims WHERE job_id = ?", (str(job_id),))
+            self._conn.commit()
+
+    def claim(self, target: str, job_id, folder: str, ttl: float = CLAIM_TTL) -> bool:
+        """
+        Reserve the output file `target` for one book; True if the book
+        holds the claim (claiming again is a no-op). Claims older than
+        `ttl` seconds are taken over.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM claims WHERE target = ? AND claimed_at < ?", (target, now - ttl)
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO claims (target, job_id, folder, claimed_at) VALUES (?, ?, ?, ?)",
+                (target, str(job_id), folder, now),
+            )
+            row = self._conn.execute(
+                "SELECT job_id, folder FROM claims WHERE target = ?", (target,)
+            ).fetchone()
+            self._conn.commit()
+        return row == (str(job_id), folder)
+
+    def release(self, job_id, folder: str) -> None:
+        """Drop the book's claims."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM claims WHERE job_id = ? AND folder = ?", (str(job_id), folder)
+            )
+            self._conn.commit()
+
+    def book(self, job_id, folder: str) -> "BookCheckpoint":
+        return BookCheckpoint(folder, job_id=job_id, store=self)
+
+
+class BookCheckpoint:
+    """
+    The progress of one book. Without a store (job_id/store None) it only
+    tracks progress in memory, so callers need not special-case "no
+    checkpointing".
+    """
+
+    def __init__(self, folder: str, job_id=None, store: Optional[CheckpointStore] = None):
+        self.folder = str(folder)
+        self.job_id = job_id
+        self.store = store
+        self.stage, self.data = store.load(job_id, self.folder) if store is not None else (None, {})
+
+    def reached(self, stage: str) -> bool:
+        return _rank(self.stage) >= _rank(stage)
+
+    def mark(self, stage: str, **data: Any) -> None:
+        """Record that `stage` completed; never moves backwards."""
+        if _rank(stage) > _rank(self.stage):
+            self.stage = stage
+        self.data.update(data)
+        if self.store is not None:
+            self.store.save(self.job_id, self.folder, self.stage, self.data)
+
+    def claim(self, target: Union[str, Path]) -> bool:
+        """Reserve an output file for this book (see CheckpointStore.claim)."""
+        if self.store is not None:
+            return self.store.claim(str(target), self.job_id, self.folder)
+        with _local_claims_lock:
+            return _local_claims.setdefault(str(target), self.folder) == self.folder
+
+    def release(self) -> None:
+        """Drop this book's claims once its output is in place or it failed."""
+        if self.store is not None:
+            self.store.release(self.job_id, self.folder)
+            return
+        with _local_claims_lock:
+            for target in [t for t, folder in _local_claims.items() if folder == self.folder]:
+                del _local_claims[target]
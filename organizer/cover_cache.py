@@ -0,0 +1,116 @@
+"""
+Local cache of cover images, ready to be embedded by the muxer.
+
+Each image is downloaded once, downscaled with ffmpeg so its longer side
+is at most `max_dimension`, and stored under the SHA-256 of the original
+bytes. URLs map to those objects through small pointer files, so books
+that share a cover (or a URL seen again on a later run) cost no download
+and no extra disk space.
+
+Layout:
+  <cache_dir>/objects/ab/abcdef...-1000.jpg
+  <cache_dir>/urls/<sha1 of url>   -> "ab/abcdef...-1000.jpg"
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Union
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+
+from .http_client import get_session
+from .muxer import FFMPEG
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+class CoverCache:
+    def __init__(self, cache_dir: Union[str, Path], max_dimension: int = 1000):
+        self.cache_dir = Path(cache_dir)
+        self.max_dimension = max_dimension
+        (self.cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+        (self.cache_dir / "urls").mkdir(parents=True, exist_ok=True)
+
+    def _url_pointer(self, url: str) -> Path:
+        return self.cache_dir / "urls" / hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest: str) -> Path:
+        return self.cache_dir / "objects" / digest[:2] / f"{digest}-{self.max_dimension}.jpg"
+
+    def lookup(self, url: str) -> Optional[Path]:
+        """The cached image for `url`, without touching the network."""
+        pointer = self._url_pointer(url)
+        try:
+            target = self.cache_dir / "objects" / pointer.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        return target if target.exists() else None
+
+    def fetch(self, url: Optional[str]) -> Optional[Path]:
+        """Return a local, downscaled JPEG for `url`, downloading it if needed."""
+        if not url:
+            return None
+        cached = self.lookup(url)
+        if cached is not None:
+            return cached
+        try:
+            response = get_session().get(url)
+            response.raise_for_status()
+        except Exception as exc:
+            logger.warning("Cover download failed for %s: %s", url, exc)
+            return None
+        data = response.content
+        target = self._object_path(hashlib.sha256(data).hexdigest())
+        if not target.exists() and not self._store(data, target):
+            return None
+        _write_atomic(self._url_pointer(url), str(target.relative_to(self.cache_dir / "objects")).encode("utf-8"))
+        return target
+
+    def _store(self, data: bytes, target: Path) -> bool:
+        """Downscale `data` to a JPEG at `target`; False if it is not an image."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        size = self.max_dimension
+        scale = f"scale='min(iw,{size})':'min(ih,{size})':force_original_aspect_ratio=decrease"
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-", suffix=".jpg")
+        os.close(fd)
+        result = subprocess.run(
+            [FFMPEG, "-hide_banner", "-nostdin", "-y", "-i", "pipe:0",
+             "-vf", scale, "-frames:v", "1", "-q:v", "3", "-f", "mjpeg", tmp],
+            input=data, capture_output=True,
+        )
+        if result.returncode != 0:
+            os.unlink(tmp)
+            logger.warning("Could not decode cover image (%d bytes)", len(data))
+            return False
+        os.replace(tmp, target)
+        return True
+
+
+_cache: Optional[CoverCache] = None
+
+
+def configure(cache_dir: Union[str, Path], max_dimension: int = 1000) -> CoverCache:
+    """Install the shared cover cache, e.g. with paths taken from settings."""
+    global _cache
+    _cache = CoverCache(cache_dir, max_dimension)
+    return _cache
+
+
+def get_cache() -> CoverCache:
+    """The shared cover cache; defaults to a directory under the system temp dir."""
+    global _cache
+    if _cache is None:
+        _cache = CoverCache(Path(tempfile.gettempdir()) / "autobook-covers")
+    return _cache
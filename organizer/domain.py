@@ -52,6 +52,8 @@ class BookCandidate:
     series_index_hint: Optional[str] = None  # "01", "1", "1.5", etc.
 
     files: List[AudioFile] = field(default_factory=list)
+    source_dir: Optional[Path] = None      # folder holding the files, once grouped on disk
+    content_digest: Optional[str] = None   # organizer.content_hash.book_digest of the files
 
     def add_file(self, f: AudioFile) -> None:
         self.files.append(f)
@@ -92,6 +94,8 @@ class LayoutPlan:
     output_dir: Path
     output_file: Path
     will_convert_to_m4b: bool = True
+    # Name of the organizer.encoder_profiles profile used for transcoding
+    encoder_profile: str = "standard"
 
 
 @dataclass
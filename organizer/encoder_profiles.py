@@ -0,0 +1,97 @@
+"""
+Named ffmpeg AAC encoder settings, so throughput can be traded for quality
+per job (see Job.encoder_profile and LayoutPlan.encoder_profile).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = os.environ.get("FFMPEG_BIN", "ffmpeg")
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    name: str
+    label: str
+    audio_args: Tuple[str, ...]
+
+
+PROFILES: Dict[str, EncoderProfile] = {
+    p.name: p
+    for p in (
+        EncoderProfile(
+            "fast",
+            "Fast (AAC 64k mono, fast coder)",
+            ("-c:a", "aac", "-aac_coder", "fast", "-b:a", "64k", "-ac", "1"),
+        ),
+        EncoderProfile(
+            "standard",
+            "Standard (AAC 64k)",
+            ("-c:a", "aac", "-b:a", "64k"),
+        ),
+        EncoderProfile(
+            "archive",
+            "Archive (AAC 128k stereo)",
+            ("-c:a", "aac", "-aac_coder", "twoloop", "-b:a", "128k", "-ac", "2"),
+        ),
+    )
+}
+
+DEFAULT_PROFILE = "standard"
+
+PROFILE_CHOICES = [(p.name, p.label) for p in PROFILES.values()]
+
+
+def get_profile(name: Optional[str]) -> EncoderProfile:
+    """Look up a profile by name; None means DEFAULT_PROFILE."""
+    try:
+        return PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"unknown encoder profile {name!r}; expected one of {', '.join(PROFILES)}") from None
+
+
+@dataclass
+class BenchmarkResult:
+    profile: str
+    seconds: float
+    audio_seconds: float
+    output_bytes: int
+
+    @property
+    def speed(self) -> float:
+        """Encode speed as a multiple of real time."""
+        return self.audio_seconds / self.seconds if self.seconds else 0.0
+
+
+def benchmark(sample: Path, profiles: Optional[Iterable[str]] = None) -> List[BenchmarkResult]:
+    """
+    Encode `sample` once with each profile and time it. Use a few minutes of
+    typical source audio; results are only comparable on the same host.
+    """
+    from mutagen import File as MutagenFile
+
+    audio = MutagenFile(str(sample))
+    audio_seconds = audio.info.length if audio is not None else 0.0
+    results = []
+    with tempfile.TemporaryDirectory(prefix="autobook-bench-") as tmp:
+        for name in profiles or PROFILES:
+            profile = get_profile(name)
+            dest = Path(tmp) / f"{profile.name}.m4a"
+            cmd = [FFMPEG, "-hide_banner", "-nostdin", "-y", "-i", str(sample),
+                   "-map", "0:a", *profile.audio_args, "-f", "ipod", str(dest)]
+            started = time.perf_counter()
+            subprocess.run(cmd, capture_output=True, check=True)
+            result = BenchmarkResult(profile.name, time.perf_counter() - started, audio_seconds, dest.stat().st_size)
+            logger.info("%s: %.1fx real time, %d bytes", profile.name, result.speed, result.output_bytes)
+            results.append(result)
+    return results
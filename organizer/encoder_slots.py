@@ -0,0 +1,91 @@
+"""
+Host-wide limit on concurrent encoders.
+
+Every Celery worker process on a host shares one directory of slot files;
+holding an exclusive flock on a file is holding that slot. The kernel
+drops the lock when its owner exits, so a crashed worker never leaks a
+slot and no external service is needed.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+import fcntl
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EncoderSlots:
+    """
+    `slots` encoder slots shared by all processes using `lock_dir`.
+
+    acquire(n) blocks until at least one slot is free and then takes up to
+    `n`, returning however many it got. Callers size their work to that
+    count (e.g. the number of segment transcoders), so nobody waits while
+    holding a slot and a busy host degrades to fewer ffmpeg processes per
+    book instead of oversubscribing.
+    """
+
+    def __init__(self, lock_dir: Union[str, Path], slots: int, poll: float = 0.5):
+        self.lock_dir = Path(lock_dir)
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.slots = max(1, slots)
+        self.poll = poll
+
+    def _try_take(self, wanted: int) -> List[int]:
+        held = []
+        for i in range(self.slots):
+            if len(held) >= wanted:
+                break
+            fd = os.open(self.lock_dir / f"slot-{i}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            held.append(fd)
+        return held
+
+    @contextmanager
+    def acquire(self, wanted: int = 1) -> Iterator[int]:
+        wanted = max(1, min(wanted, self.slots))
+        started = time.monotonic()
+        held = self._try_take(wanted)
+        while not held:
+            time.sleep(self.poll)
+            held = self._try_take(wanted)
+        waited = time.monotonic() - started
+        if waited >= 1:
+            logger.info("Waited %.1fs for an encoder slot", waited)
+        try:
+            yield len(held)
+        finally:
+            for fd in held:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+
+_slots: Optional[EncoderSlots] = None
+
+
+def configure(lock_dir: Union[str, Path, None], slots: int) -> Optional[EncoderSlots]:
+    """Install the shared scheduler (no lock_dir or slots <= 0 disables it)."""
+    global _slots
+    _slots = EncoderSlots(lock_dir, slots) if lock_dir and slots > 0 else None
+    return _slots
+
+
+@contextmanager
+def encoder_slots(wanted: int = 1) -> Iterator[int]:
+    """Hold up to `wanted` shared encoder slots; yields the number held."""
+    scheduler = _slots
+    if scheduler is None:
+        yield max(1, wanted)
+        return
+    with scheduler.acquire(wanted) as held:
+        yield held
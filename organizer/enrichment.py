@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+
+from .metadata_cache import normalize_key, normalize_text
+from .rate_limit import cancellable, check_cancelled
+
+logger = logging.getLogger(__name__)
+
+Metadata = Dict[str, Optional[str]]
+
+# Blocking provider calls run here rather than in asyncio's default
+# executor, so asyncio.run() does not wait for abandoned lookups to finish.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider")
+
+
+@dataclass(frozen=True)
+class Provider:
+    """
+    A metadata source queried during enrichment.
+
+    `lookup(folder, title, author)` is a blocking call returning a metadata
+    dict (or None / {}). Primary providers identify the book (they supply a
+    title); supplementary ones only fill in `fields` such as an ASIN or a
+    cover URL.
+    """
+    name: str
+    lookup: Callable[[str, str, str], Optional[Metadata]]
+    timeout: float = 15.0
+    primary: bool = True
+    fields: FrozenSet[str] = frozenset()
+
+
+def _lookup(provider: Provider, cancel: threading.Event, folder: str, title: str, author: str) -> Optional[Metadata]:
+    with cancellable(cancel):
+        check_cancelled()  # cancelled while queued for the executor
+        return provider.lookup(folder, title, author)
+
+
+async def enrich_async(folder: str, title: str, author: str, providers: List[Provider]) -> Metadata:
+    """
+    Query all providers concurrently and merge their answers by priority.
+
+    `providers` is in priority order. Every lookup starts immediately with
+    its own timeout. Results are then consumed in priority order: the first
+    primary provider that returns a title wins and lower primaries are
+    cancelled; supplementary providers are only awaited while one of their
+    fields is still missing. Earlier providers never get overwritten, so
+    the latency is roughly that of the slowest provider actually needed.
+
+    Cancelling a lookup also sets its cancel event, so a lookup that has
+    not sent its request yet stops at its next throttle() (see
+    organizer.rate_limit.cancellable) instead of spending a rate-limit
+    token and an executor thread on an answer nobody reads.
+    """
+    loop = asyncio.get_running_loop()
+    cancels = {p.name: threading.Event() for p in providers}
+
+    async def run(provider: Provider) -> Optional[Metadata]:
+        cancel = cancels[provider.name]
+        call = loop.run_in_executor(_executor, _lookup, provider, cancel, folder, title, author)
+        try:
+            return await asyncio.wait_for(call, provider.timeout)
+        except asyncio.TimeoutError:
+            cancel.set()
+            raise
+
+    tasks = {p.name: asyncio.create_task(run(p)) for p in providers}
+    merged: Metadata = {}
+    try:
+        for provider in providers:
+            task = tasks[provider.name]
+            if provider.primary:
+                needed = not merged.get("title")
+            else:
+                needed = any(not merged.get(f) for f in provider.fields)
+            if not needed:
+                cancels[provider.name].set()
+                task.cancel()
+                continue
+            try:
+                result = await task
+            except asyncio.TimeoutError:
+                logger.info("%s timed out for %s", provider.name, folder)
+                continue
+            except Exception as exc:
+                logger.info("%s failed for %s: %s", provider.name, folder, exc)
+                continue
+            for key, value in (result or {}).items():
+                if value and not merged.get(key):
+                    merged[key] = value
+    finally:
+        for name, task in tasks.items():
+            if not task.done():
+                cancels[name].set()
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark as retrieved
+    return merged
+
+
+def enrich_concurrently(folder: str, title: str, author: str, providers: List[Provider]) -> Metadata:
+    """Blocking wrapper around enrich_async for use from worker threads."""
+    return asyncio.run(enrich_async(folder, title, author, providers))
+
+
+def group_queries(queries: Iterable[Tuple[str, str]]) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Deduplicate (title, author) queries and group the distinct ones by
+    normalized author. Unknown authors are grouped under "".
+    """
+    seen = set()
+    by_author: Dict[str, List[Tuple[str, str]]] = {}
+    for title, author in queries:
+        key = normalize_key(title, author)
+        if key in seen:
+            continue
+        seen.add(key)
+        author_key = "" if not author or author == "Unknown" else normalize_text(author)
+        by_author.setdefault(author_key, []).append((title, author))
+    return by_author
+
+
+# Minimum word-level similarity (difflib ratio over normalized words) for a
+# near match in match_title; "Dune" vs "Dune Messiah" scores 0.67
+TITLE_MATCH_THRESHOLD = 0.9
+
+
+def title_similarity(a: Optional[str], b: Optional[str]) -> float:
+    """
+    Word-level similarity of two titles in [0, 1]; 0 if their numbers
+    differ, so "Book 2" never matches "Book 3".
+    """
+    words_a, words_b = normalize_text(a).split(), normalize_text(b).split()
+    if not words_a or not words_b:
+        return 0.0
+    if [w for w in words_a if w.isdigit()] != [w for w in words_b if w.isdigit()]:
+        return 0.0
+    return SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+
+def match_title(title: str, volumes: List[Metadata]) -> Optional[Metadata]:
+    """
+    Pick the volume from an author-level result list that matches `title`:
+    an exact normalized match, else the most similar title scoring at least
+    TITLE_MATCH_THRESHOLD. None means the book needs a lookup of its own.
+    """
+    wanted = normalize_text(title)
+    if not wanted:
+        return None
+    best, best_score = None, 0.0
+    for volume in volumes:
+        found = normalize_text(volume.get("title"))
+        if not found:
+            continue
+        if found == wanted:
+            return volume
+        score = title_similarity(wanted, found)
+        if score >= TITLE_MATCH_THRESHOLD and score > best_score:
+            best, best_score = volume, score
+    return best
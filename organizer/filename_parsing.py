@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
+import re
 import uuid
 
 from .domain import AudioFile, BookCandidate, SourceFormat
+from .tag_probe import TagProbeError, probe_tags
 
 
 def detect_source_format(path: Path) -> SourceFormat:
@@ -19,6 +21,19 @@ def detect_source_format(path: Path) -> SourceFormat:
     }.get(ext, SourceFormat.OTHER)
 
 
+def parse_tag_number(value: Optional[str]) -> Optional[int]:
+    """Parse track/disc tags such as "3", "03/12" or "3 of 12"."""
+    if not value:
+        return None
+    match = re.match(r"\s*(\d+)", value)
+    return int(match.group(1)) if match else None
+
+
+def natural_sort_key(name: str) -> List[object]:
+    """Sort key comparing digit runs as numbers: "Track 2" before "Track 10"."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name.lower())]
+
+
 def build_candidates_from_files(files: Iterable[Path]) -> List[BookCandidate]:
     """
     Very first-pass heuristic: group by parent directory name.
@@ -26,6 +41,9 @@ def build_candidates_from_files(files: Iterable[Path]) -> List[BookCandidate]:
       - multiple books in one folder
       - disc subfolders
       - weird naming schemes
+
+    Track / disc numbers and an author hint come from a header-only tag
+    probe (organizer.tag_probe); files it cannot read are left without them.
     """
     by_parent: dict[Path, BookCandidate] = {}
 
@@ -38,11 +56,21 @@ def build_candidates_from_files(files: Iterable[Path]) -> List[BookCandidate]:
                 raw_title_hint=parent.name,
             )
 
+        try:
+            tags = probe_tags(path) or {}
+        except (TagProbeError, OSError):
+            tags = {}
+
         audio_file = AudioFile(
             path=path,
             size_bytes=path.stat().st_size,
             format=detect_source_format(path),
+            track_number=parse_tag_number(tags.get("track")),
+            disc_number=parse_tag_number(tags.get("disc")),
         )
-        by_parent[parent].add_file(audio_file)
+        candidate = by_parent[parent]
+        if candidate.raw_author_hint is None and tags.get("artist"):
+            candidate.raw_author_hint = tags["artist"]
+        candidate.add_file(audio_file)
 
     return list(by_parent.values())
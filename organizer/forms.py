@@ -1,6 +1,9 @@
 from django import forms
 
+from .encoder_profiles import DEFAULT_PROFILE, PROFILE_CHOICES
+
 class InputForm(forms.Form):
     input_path = forms.CharField(label='Input Path', max_length=255, required=False)
     upload = forms.FileField(label='Upload Zip/Folder', required=False)
     output_path = forms.CharField(label='Output Path', max_length=255)
+    encoder_profile = forms.ChoiceField(label='Encoder Profile', choices=PROFILE_CHOICES, initial=DEFAULT_PROFILE)
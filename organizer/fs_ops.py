@@ -0,0 +1,82 @@
+"""
+Moves that stay O(1) whenever the filesystem allows it.
+
+shutil.move silently degrades to a full copy whenever rename() fails with
+EXDEV, e.g. between two bind mounts of the same volume. Here a rename is
+tried first; across devices each file is reflinked (a copy-on-write clone,
+also O(1) on btrfs/XFS, including across mounts of one filesystem) and
+only copied byte by byte when that is unsupported too, with a log line
+so slow finalizes are visible.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Union
+import errno
+import fcntl
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+FICLONE = 0x40049409  # linux/fs.h
+
+
+def reflink(src: PathLike, dst: PathLike) -> bool:
+    """Clone `src` to `dst` copy-on-write; False if the filesystem can't."""
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _rename(src: PathLike, dst: PathLike) -> bool:
+    try:
+        os.rename(src, dst)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+        return False
+    return True
+
+
+def move_file(src: PathLike, dst: PathLike) -> Path:
+    """Move a file to `dst` (a full target path), replacing any existing file."""
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if _rename(src, dst):
+        return dst
+    partial = dst.with_name(dst.name + ".part")
+    if not reflink(src, partial):
+        logger.warning("Cross-device move of %s copies %d bytes", src, src.stat().st_size)
+        shutil.copy2(src, partial)
+    os.replace(partial, dst)
+    src.unlink()
+    return dst
+
+
+def move_tree(src: PathLike, dst: PathLike) -> Path:
+    """Move a directory to `dst` (which must not exist yet)."""
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if _rename(src, dst):
+        return dst
+    logger.info("Moving %s across devices file by file", src)
+    for root, _dirs, files in os.walk(src):
+        target_dir = dst / Path(root).relative_to(src)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            move_file(Path(root) / name, target_dir / name)
+    shutil.rmtree(src)
+    return dst
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple, Union
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+USER_AGENT = "Mozilla/5.0"
+DEFAULT_TIMEOUT: Timeout = (5.0, 30.0)  # (connect, read) seconds
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to every request."""
+
+    def __init__(self, timeout: Timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def build_session(
+    per_host_connections: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    timeout: Timeout = DEFAULT_TIMEOUT,
+) -> requests.Session:
+    """
+    Create a keep-alive Session for the metadata providers.
+
+    Connections are pooled per host and capped at `per_host_connections`
+    (callers block for a free connection instead of opening more).
+    Connection errors and 429/5xx responses on idempotent requests are
+    retried `retries` times with exponential backoff, honouring
+    Retry-After.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = _PooledAdapter(
+        timeout=timeout,
+        max_retries=retry,
+        pool_connections=16,
+        pool_maxsize=per_host_connections,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def configure(**kwargs) -> requests.Session:
+    """Replace the shared session, e.g. with limits taken from settings."""
+    global _session
+    with _lock:
+        old, _session = _session, build_session(**kwargs)
+    if old is not None:
+        old.close()
+    return _session
+
+
+def get_session() -> requests.Session:
+    """The process-wide pooled session shared by every provider."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = build_session()
+    return _session
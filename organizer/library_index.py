@@ -0,0 +1,89 @@
+"""
+What is already in the output library, so books that were converted
+before are not converted again.
+
+The index is built once per output root and process by walking the tree
+(Author/[Series/]Title/*.m4b, as laid out by plan_layout) and is then
+kept up to date as books are finalized. Entries are keyed by the
+normalized (title, author), so differences in case, accents or
+punctuation between runs still match.
+
+It does not see books finalized by other processes after it was built;
+callers also check the planned output folder on disk (see
+organizer.utils._library_step).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import logging
+import os
+import threading
+
+from .metadata_cache import normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Top-level folders of the output root that are not part of the library
+EXCLUDED_DIRS = frozenset({"archive"})
+
+
+class LibraryIndex:
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Path]]] = None
+
+    def _build(self) -> Dict[str, List[Path]]:
+        entries: Dict[str, List[Path]] = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if Path(dirpath) == self.root:
+                dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+            parts = Path(dirpath).relative_to(self.root).parts
+            if len(parts) < 2:
+                continue
+            for name in filenames:
+                if name.lower().endswith(".m4b"):
+                    key = normalize_key(parts[-1], parts[0])
+                    entries.setdefault(key, []).append(Path(dirpath) / name)
+        logger.info("Library index for %s: %d books", self.root, len(entries))
+        return entries
+
+    def _ensure(self) -> Dict[str, List[Path]]:
+        if self._entries is None:
+            self._entries = self._build()
+        return self._entries
+
+    def find(self, title: str, author: str) -> Optional[Path]:
+        """An existing M4B for the book, or None."""
+        with self._lock:
+            paths = self._ensure().get(normalize_key(title, author), [])
+            paths[:] = [p for p in paths if p.exists()]
+            return paths[0] if paths else None
+
+    def add(self, title: str, author: str, path: Union[str, Path]) -> None:
+        path = Path(path)
+        with self._lock:
+            paths = self._ensure().setdefault(normalize_key(title, author), [])
+            if path not in paths:
+                paths.append(path)
+
+    def discard(self, title: str, author: str, path: Union[str, Path]) -> None:
+        with self._lock:
+            paths = self._ensure().get(normalize_key(title, author), [])
+            if Path(path) in paths:
+                paths.remove(Path(path))
+
+
+_indexes: Dict[str, LibraryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: Union[str, Path]) -> LibraryIndex:
+    """The shared index of the library under `root`."""
+    key = os.path.normpath(str(root))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LibraryIndex(key)
+        return _indexes[key]
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+import functools
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from .rate_limit import LookupCancelled
+
+logger = logging.getLogger(__name__)
+
+MISS = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    provider TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (provider, key)
+);
+CREATE INDEX IF NOT EXISTS lookups_last_used ON lookups (last_used);
+"""
+
+DAY = 24 * 60 * 60
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lower-case, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def normalize_key(title: Optional[str], author: Optional[str]) -> str:
+    """Case-, accent-, punctuation- and whitespace-insensitive lookup key."""
+    return f"{normalize_text(title)}|{normalize_text(author)}"
+
+
+class MetadataCache:
+    """
+    On-disk cache of metadata provider lookups, keyed by provider and the
+    normalized (title, author).
+
+    - Positive results live for `ttl` seconds.
+    - Empty results ("provider has nothing for this book") are cached as
+      negatives for `negative_ttl`, so misses are not re-queried each run.
+    - Lookups that raised (network errors, throttling) are cached as
+      negatives for the shorter `error_ttl`.
+    - Once more than `max_entries` rows exist, the least recently used are
+      evicted.
+
+    Safe to share between threads; several processes may use the same file.
+    """
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        ttl: float = 30 * DAY,
+        negative_ttl: float = DAY,
+        error_ttl: float = 15 * 60,
+        max_entries: int = 50_000,
+    ):
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._puts = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, provider: str, title: Optional[str], author: Optional[str]) -> Any:
+        """Return the cached value (None for a negative), or MISS."""
+        key = normalize_key(title, author)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM lookups WHERE provider = ? AND key = ?",
+                (provider, key),
+            ).fetchone()
+            if row is None or row[1] < now:
+                return MISS
+            self._conn.execute(
+                "UPDATE lookups SET last_used = ? WHERE provider = ? AND key = ?",
+                (now, provider, key),
+            )
+            self._conn.commit()
+        return json.loads(row[0]) if row[0] is not None else None
+
+    def put(
+        self,
+        provider: str,
+        title: Optional[str],
+        author: Optional[str],
+        value: Any,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Store a result; falsy values are stored as negatives."""
+        if ttl is None:
+            ttl = self.ttl if value else self.negative_ttl
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lookups (provider, key, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    provider,
+                    normalize_key(title, author),
+                    json.dumps(value) if value else None,
+                    now + ttl,
+                    now,
+                ),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM lookups WHERE expires_at < ?", (time.time(),))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM lookups").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM lookups WHERE rowid IN "
+                "(SELECT rowid FROM lookups ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+
+_cache: Optional[MetadataCache] = None
+
+
+def configure(db_path: Union[str, Path, None], **kwargs) -> Optional[MetadataCache]:
+    """Install the shared cache used by cached_lookup (None disables caching)."""
+    global _cache
+    old, _cache = _cache, (MetadataCache(db_path, **kwargs) if db_path else None)
+    if old is not None:
+        old.close()
+    return _cache
+
+
+def get_cache() -> Optional[MetadataCache]:
+    return _cache
+
+
+def cached_lookup(provider: str, fallback: Any = None) -> Callable:
+    """
+    Decorate a `func(title, author)` provider lookup with the shared cache.
+
+    The wrapped function may raise on transport errors; the wrapper logs,
+    caches the failure for `error_ttl` and returns `fallback`. Negative
+    results are also returned as `fallback`.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(title, author=None):
+            cache = _cache
+            if cache is not None:
+                hit = cache.get(provider, title, author)
+                if hit is not MISS:
+                    return hit if hit is not None else fallback
+            try:
+                value = func(title, author)
+            except LookupCancelled:
+                raise  # nobody waits for the answer; not a provider failure
+            except Exception as exc:
+                logger.warning("%s lookup for %r / %r failed: %s", provider, title, author, exc)
+                if cache is not None:
+                    cache.put(provider, title, author, None, ttl=cache.error_ttl)
+                return fallback
+            if cache is not None:
+                cache.put(provider, title, author, value)
+            return value if value else fallback
+        return wrapper
+    return decorator
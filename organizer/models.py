@@ -1,12 +1,22 @@
 from django.db import models
 
+from .encoder_profiles import DEFAULT_PROFILE, PROFILE_CHOICES
+
 class Job(models.Model):
     input_path = models.CharField(max_length=255)
     output_path = models.CharField(max_length=255)
     status = models.CharField(max_length=50, default='pending')
+    encoder_profile = models.CharField(max_length=20, choices=PROFILE_CHOICES, default=DEFAULT_PROFILE)
     created_at = models.DateTimeField(auto_now_add=True)
 
 class Log(models.Model):
     job = models.ForeignKey(Job, on_delete=models.CASCADE)
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    book = models.CharField(max_length=255, blank=True, default='')
+    stage = models.CharField(max_length=20, blank=True, default='')
+    duration = models.FloatField(null=True, blank=True)  # seconds
+
+    class Meta:
+        # Serves the logs endpoint's "rows of this job after id N" cursor
+        indexes = [models.Index(fields=['job', 'id'], name='log_job_id_idx')]
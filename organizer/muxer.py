@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from mutagen import File as MutagenFile, MutagenError
+from mutagen.mp4 import MP4
+
+from .domain import AudioFile, BookCandidate, LayoutPlan, SourceFormat
+from .encoder_profiles import DEFAULT_PROFILE, FFMPEG, get_profile
+from .filename_parsing import detect_source_format, natural_sort_key, parse_tag_number
+from .tag_probe import TagProbeError, probe_tags
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIO_ARGS = list(get_profile(DEFAULT_PROFILE).audio_args)
+COPY_AUDIO_ARGS = ["-c:a", "copy"]
+
+# Threads per ffmpeg process (-threads); 0 leaves it to ffmpeg
+_threads = 0
+
+
+def configure(threads: int = 0) -> None:
+    """Set the number of threads each ffmpeg process may use."""
+    global _threads
+    _threads = max(0, threads)
+
+
+def _thread_args() -> List[str]:
+    return ["-threads", str(_threads)] if _threads else []
+
+
+class MuxError(RuntimeError):
+    """ffmpeg could not produce the M4B."""
+
+
+@dataclass
+class Chapter:
+    title: str
+    start_ms: int
+    end_ms: int
+
+
+def _folder_files(folder: Path) -> List[AudioFile]:
+    """The audio files of a folder, with track/disc numbers from a tag probe."""
+    files = []
+    for path in Path(folder).iterdir():
+        if not path.is_file() or detect_source_format(path) is SourceFormat.OTHER:
+            continue
+        try:
+            tags = probe_tags(path) or {}
+        except (TagProbeError, OSError):
+            tags = {}
+        files.append(AudioFile(
+            path=path,
+            size_bytes=0,
+            format=detect_source_format(path),
+            track_number=parse_tag_number(tags.get("track")),
+            disc_number=parse_tag_number(tags.get("disc")),
+        ))
+    return files
+
+
+def book_inputs(candidate: BookCandidate) -> List[Path]:
+    """
+    The candidate's audio files in playback order: by disc, then track,
+    then file name (numbers in names compared numerically). Candidates
+    built from a bare folder list and probe it instead.
+    """
+    files = candidate.files
+    if not files and candidate.source_dir is not None:
+        files = _folder_files(candidate.source_dir)
+    ordered = sorted(
+        files,
+        key=lambda f: (f.disc_number or 0, f.track_number or 0, natural_sort_key(f.path.name)),
+    )
+    return [f.path for f in ordered]
+
+
+def duration_ms(path: Path) -> int:
+    """Length of an audio file, from its stream headers."""
+    try:
+        audio = MutagenFile(str(path))
+    except MutagenError as exc:
+        raise MuxError(f"cannot read duration of {path}: {exc}") from exc
+    if audio is None or not getattr(audio, "info", None):
+        raise MuxError(f"cannot read duration of {path}")
+    return int(round(audio.info.length * 1000))
+
+
+def chapters_for(inputs: Sequence[Path], titles: Optional[Sequence[str]] = None) -> List[Chapter]:
+    """One chapter per input file, titled from `titles` or the file stem."""
+    chapters, start = [], 0
+    for i, path in enumerate(inputs):
+        end = start + duration_ms(path)
+        title = titles[i] if titles and i < len(titles) else path.stem
+        chapters.append(Chapter(title=title, start_ms=start, end_ms=end))
+        start = end
+    return chapters
+
+
+_NUMBERED = re.compile(r"(\d+) - (.*)")
+
+
+def chapter_titles(inputs: Sequence[Path]) -> List[str]:
+    """
+    Chapter names for the inputs in playback order: "Chapter NN - Name" for
+    files named "NN - Name.ext", else "Chapter NN" by position.
+    """
+    titles = []
+    for i, path in enumerate(inputs, start=1):
+        match = _NUMBERED.fullmatch(path.stem)
+        if match:
+            titles.append(f"Chapter {int(match.group(1)):02d} - {match.group(2)}")
+        else:
+            titles.append(f"Chapter {i:02d}")
+    return titles
+
+
+def stream_signature(path: Path) -> Optional[Tuple[str, int, int]]:
+    """(codec, sample_rate, channels) of an MP4-family file, else None."""
+    if detect_source_format(path) not in (SourceFormat.AAC, SourceFormat.M4B):
+        return None
+    try:
+        info = MP4(str(path)).info
+    except MutagenError:
+        return None
+    return getattr(info, "codec", ""), info.sample_rate, info.channels
+
+
+def can_stream_copy(inputs: Sequence[Path]) -> bool:
+    """
+    True when every input is AAC in an MP4 container with the same sample
+    rate and channel layout, so the book can be remuxed without re-encoding.
+    """
+    signatures = {stream_signature(p) for p in inputs}
+    if len(signatures) != 1:
+        return False
+    signature = signatures.pop()
+    return signature is not None and signature[0].startswith("mp4a")
+
+
+def _escape_meta(value: str) -> str:
+    for ch in ("\\", "=", ";", "#", "\n"):
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+
+def ffmetadata(plan: LayoutPlan, chapters: Sequence[Chapter]) -> str:
+    """FFMETADATA1 document carrying the book tags and chapter list."""
+    book = plan.enriched_book
+    tags = {
+        "title": book.title,
+        "album": book.title,
+        "artist": book.author,
+        "album_artist": book.author,
+        "genre": "Audiobook",
+    }
+    if book.series:
+        tags["grouping"] = book.series
+    if book.description:
+        tags["comment"] = book.description
+    if book.publish_year:
+        tags["date"] = str(book.publish_year)
+    lines = [";FFMETADATA1"]
+    lines += [f"{k}={_escape_meta(v)}" for k, v in tags.items()]
+    for chapter in chapters:
+        lines += [
+            "[CHAPTER]",
+            "TIMEBASE=1/1000",
+            f"START={chapter.start_ms}",
+            f"END={chapter.end_ms}",
+            f"title={_escape_meta(chapter.title)}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _concat_list(inputs: Sequence[Path]) -> str:
+    def quote(path: Path) -> str:
+        return "'" + str(path.resolve()).replace("'", "'\\''") + "'"
+    return "".join(f"file {quote(p)}\n" for p in inputs)
+
+
+def _profile_args(plan: LayoutPlan) -> List[str]:
+    return list(get_profile(plan.encoder_profile).audio_args)
+
+
+def mux_m4b(
+    plan: LayoutPlan,
+    output_file: Path,
+    inputs: Optional[Sequence[Path]] = None,
+    chapters: Optional[Sequence[Chapter]] = None,
+    audio_args: Optional[Sequence[str]] = None,
+) -> Path:
+    """
+    Build the M4B for `plan` with a single ffmpeg run: concatenate the
+    inputs, encode, and write tags, chapters and (if
+    plan.enriched_book.cover_image_path is set) the cover in the same pass.
+
+    Unless `audio_args` is given, inputs that are all compatible AAC (see
+    can_stream_copy) are stream-copied, and anything else is encoded with
+    plan.encoder_profile (organizer.encoder_profiles). A single
+    input keeps its own embedded chapters.
+
+    The file is written next to `output_file` and renamed into place only
+    on success. Raises MuxError on failure.
+    """
+    book = plan.enriched_book
+    inputs = list(inputs or book_inputs(book.candidate))
+    if not inputs:
+        raise MuxError(f"no audio files for {book.title!r}")
+    # The concat demuxer stops at an input it cannot open and still exits 0
+    missing = [str(path) for path in inputs if not Path(path).is_file()]
+    if missing:
+        raise MuxError(f"missing audio files for {book.title!r}: {', '.join(missing)}")
+    if audio_args is None:
+        audio_args = COPY_AUDIO_ARGS if can_stream_copy(inputs) else _profile_args(plan)
+    single = len(inputs) == 1 and chapters is None
+    chapters = [] if single else list(chapters or chapters_for(inputs, chapter_titles(inputs)))
+    cover = book.cover_image_path if book.cover_image_path and Path(book.cover_image_path).exists() else None
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    partial = output_file.with_name(output_file.name + ".part")
+
+    with tempfile.TemporaryDirectory(prefix="autobook-mux-") as tmp:
+        concat_path = Path(tmp) / "inputs.txt"
+        meta_path = Path(tmp) / "metadata.txt"
+        concat_path.write_text(_concat_list(inputs), encoding="utf-8")
+        meta_path.write_text(ffmetadata(plan, chapters), encoding="utf-8")
+
+        cmd = [FFMPEG, "-hide_banner", "-nostdin", "-y"]
+        if single:
+            cmd += ["-i", str(inputs[0])]
+        else:
+            cmd += ["-f", "concat", "-safe", "0", "-i", str(concat_path)]
+        cmd += ["-f", "ffmetadata", "-i", str(meta_path)]
+        if cover:
+            cmd += ["-i", str(cover)]
+        cmd += ["-map", "0:a", "-map_metadata", "1", "-map_chapters", "0" if single else "1"]
+        if cover:
+            cmd += ["-map", "2:v", "-c:v", "copy", "-disposition:v:0", "attached_pic"]
+        cmd += [*audio_args, *_thread_args(), "-movflags", "+faststart", "-f", "ipod", str(partial)]
+
+        logger.info("Muxing %d files into %s (%s)", len(inputs), output_file,
+                    "stream copy" if list(audio_args) == COPY_AUDIO_ARGS else "transcode")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        partial.unlink(missing_ok=True)
+        raise MuxError(f"ffmpeg exited {result.returncode}: {result.stderr[-2000:]}")
+    os.replace(partial, output_file)
+    return output_file
+
+
+def transcode_segment(source: Path, dest: Path, audio_args: Sequence[str] = DEFAULT_AUDIO_ARGS) -> Path:
+    """
+    Encode one source file to an AAC segment (audio only, no tags). An
+    existing `dest` is a segment finished by an earlier attempt and is kept.
+    """
+    if dest.exists():
+        return dest
+    partial = dest.with_name(dest.name + ".part")
+    cmd = [FFMPEG, "-hide_banner", "-nostdin", "-y", "-i", str(source),
+           "-map", "0:a", "-map_metadata", "-1", *audio_args, *_thread_args(), "-f", "ipod", str(partial)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        partial.unlink(missing_ok=True)
+        raise MuxError(f"ffmpeg exited {result.returncode} on {source.name}: {result.stderr[-2000:]}")
+    os.replace(partial, dest)
+    return dest
+
+
+def _segment_name(source: Path, audio_args: Sequence[str]) -> str:
+    st = source.stat()
+    key = "\0".join([str(source.resolve()), str(st.st_size), str(st.st_mtime_ns), *audio_args])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + ".m4a"
+
+
+def mux_m4b_segmented(
+    plan: LayoutPlan,
+    output_file: Path,
+    workers: int,
+    inputs: Optional[Sequence[Path]] = None,
+    audio_args: Optional[Sequence[str]] = None,
+) -> Path:
+    """
+    Like mux_m4b, but transcode each input to its own AAC segment with up
+    to `workers` ffmpeg processes at once, then stream-copy the segments
+    into the M4B. Chapters are built from the encoded segment durations
+    and titled by chapter_titles.
+
+    Segments are written to a directory next to `output_file` that is only
+    removed once the M4B is complete, so a retried conversion re-encodes
+    just the segments that were not finished. Segment names depend on the
+    source file and encoder settings, so stale segments are never reused.
+    """
+    book = plan.enriched_book
+    inputs = list(inputs or book_inputs(book.candidate))
+    if not inputs:
+        raise MuxError(f"no audio files for {book.title!r}")
+    audio_args = list(audio_args or _profile_args(plan))
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    segment_dir = output_file.parent / f".{output_file.stem}.segments"
+    segment_dir.mkdir(exist_ok=True)
+    segments = [segment_dir / _segment_name(p, audio_args) for p in inputs]
+    done = sum(1 for p in segments if p.exists())
+    logger.info("Transcoding %d segments for %s with %d workers (%d already done)",
+                len(inputs) - done, output_file, workers, done)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as pool:
+        # Each task just waits on its own ffmpeg process
+        list(pool.map(lambda pair: transcode_segment(*pair, audio_args), zip(inputs, segments)))
+    chapters = chapters_for(segments, titles=chapter_titles(inputs))
+    mux_m4b(plan, output_file, inputs=segments, chapters=chapters, audio_args=COPY_AUDIO_ARGS)
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    return output_file
+
+
+def build_m4b(plan: LayoutPlan, output_file: Path, workers: int = 1) -> Path:
+    """
+    Produce the M4B for `plan` the cheapest way available: remux when the
+    inputs can be stream-copied, transcode segments in parallel when
+    `workers` > 1 and there are several inputs, else a single mux_m4b run.
+    """
+    inputs = book_inputs(plan.enriched_book.candidate)
+    if workers > 1 and len(inputs) > 1 and not can_stream_copy(inputs):
+        return mux_m4b_segmented(plan, output_file, workers, inputs=inputs)
+    return mux_m4b(plan, output_file, inputs=inputs)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class PipelineLimits:
+    """
+    Concurrency limits for processing the books of one job.
+
+    Each stage of the book pipeline gets its own worker count:
+    metadata_slots for network-bound lookups, convert_slots for CPU-bound
+    conversions (ffmpeg, m4b-merge, m4binder), and small pools for the
+    cover/layout and archive steps. segment_workers is how many ffmpeg
+    processes a single conversion may use for parallel segment
+    transcoding. buffer_size bounds how many books may
+    wait between two stages, so a fast scanner cannot run arbitrarily far
+    ahead of conversion.
+    """
+    convert_slots: int = 2
+    metadata_slots: int = 8
+    layout_workers: int = 2
+    archive_workers: int = 1
+    segment_workers: int = 1
+    buffer_size: int = 4
+
+
+@dataclass
+class Stage:
+    """One step of a staged pipeline: `func` runs on `workers` threads."""
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageResult:
+    """An item that left the pipeline, either completed or failed at `stage`."""
+    item: Any
+    error: Optional[str] = None
+    stage: Optional[str] = None
+
+
+_DONE = object()
+
+
+def run_stages(
+    items: Iterable[Any],
+    stages: List[Stage],
+    buffer_size: int = 4,
+) -> Iterator[StageResult]:
+    """
+    Push `items` through `stages` as a producer/consumer pipeline and yield
+    a StageResult per item as it leaves the last stage.
+
+    `items` is consumed on its own producer thread (so it may be a slow,
+    streaming scanner); every stage runs on `stage.workers` threads and
+    stages are connected by queues of at most `buffer_size` items. An item
+    whose stage function raises skips the remaining stages and is yielded
+    with the error. If `items` itself raises, the pipeline drains and the
+    exception is re-raised to the caller.
+
+    Results are yielded on the calling thread, so callers can safely write
+    job logs / DB rows from the loop body. The iterator must be exhausted.
+    """
+    queues = [queue.Queue(maxsize=max(1, buffer_size)) for _ in range(len(stages) + 1)]
+    producer_error: List[BaseException] = []
+
+    def produce() -> None:
+        try:
+            for item in items:
+                queues[0].put(StageResult(item=item))
+        except BaseException as exc:
+            producer_error.append(exc)
+        finally:
+            for _ in range(max(1, stages[0].workers) if stages else 1):
+                queues[0].put(_DONE)
+
+    def work(index: int, stage: Stage, remaining: List[int], lock: threading.Lock) -> None:
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            result = inbox.get()
+            if result is _DONE:
+                break
+            if result.error is None:
+                try:
+                    result.item = stage.func(result.item)
+                except Exception as exc:
+                    logger.exception("Stage %s failed", stage.name)
+                    result.error = str(exc) or exc.__class__.__name__
+                    result.stage = stage.name
+            outbox.put(result)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            downstream = stages[index + 1].workers if index + 1 < len(stages) else 1
+            for _ in range(max(1, downstream)):
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=produce, name="stage-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        workers = max(1, stage.workers)
+        remaining, lock = [workers], threading.Lock()
+        threads.extend(
+            threading.Thread(
+                target=work,
+                args=(index, stage, remaining, lock),
+                name=f"stage-{stage.name}-{n}",
+                daemon=True,
+            )
+            for n in range(workers)
+        )
+    for thread in threads:
+        thread.start()
+
+    sink = queues[-1]
+    while True:
+        result = sink.get()
+        if result is _DONE:
+            break
+        yield result
+    for thread in threads:
+        thread.join()
+    if producer_error:
+        raise producer_error[0]
+
+
+def imap_bounded(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    depth: int,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Apply `func` to `items` on `depth` threads, yielding (item, result)
+    pairs in completion order.
+
+    Meant for latency-bound I/O such as reading tags off a network share:
+    `items` is consumed lazily on the calling thread and at most 2 * depth
+    calls are in flight, so a huge or still-growing input never gets
+    materialised. With depth <= 1 everything runs inline. Exceptions from
+    `func` propagate to the caller.
+    """
+    if depth <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=depth, thread_name_prefix="io") as pool:
+        pending = {}
+        for item in items:
+            pending[pool.submit(func, item)] = item
+            if len(pending) >= depth * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        for future in as_completed(list(pending)):
+            yield pending.pop(future), future.result()
@@ -0,0 +1,165 @@
+"""
+Token-bucket pacing for metadata providers.
+
+Buckets use "reserve" semantics: every caller takes a token immediately,
+even if that drives the bucket negative, and is told how long to sleep
+before its turn. Callers therefore queue in arrival order at the
+configured rate instead of failing or spinning.
+
+Lookups that enrichment no longer needs are cancelled through the
+thread's cancel event (see cancellable): throttle() then raises
+LookupCancelled instead of taking a token or letting the request go out.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = bucket key; ARGV = rate (tokens/s), burst, ttl (s)
+_REDIS_RESERVE = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+
+class LookupCancelled(Exception):
+    """The provider lookup running on this thread is no longer needed."""
+
+
+_cancel = threading.local()
+
+
+@contextmanager
+def cancellable(event: threading.Event) -> Iterator[None]:
+    """Run a provider lookup on this thread that stops once `event` is set."""
+    previous = getattr(_cancel, "event", None)
+    _cancel.event = event
+    try:
+        yield
+    finally:
+        _cancel.event = previous
+
+
+def check_cancelled() -> None:
+    """Raise LookupCancelled if this thread's lookup was cancelled."""
+    event = getattr(_cancel, "event", None)
+    if event is not None and event.is_set():
+        raise LookupCancelled()
+
+
+class MemoryStore:
+    """
+    Process-local bucket state. Also serves as the in-memory stand-in for
+    RedisStore in tests, since both implement the same `reserve` contract.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, tuple] = {}
+
+    def reserve(self, key: str, rate: float, burst: float) -> float:
+        """Take one token from `key` and return the seconds to wait for it."""
+        with self._lock:
+            now = self._clock()
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate) - 1
+            self._buckets[key] = (tokens, now)
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+
+class RedisStore:
+    """
+    Bucket state shared by every worker that talks to the same Redis, so
+    the configured rate holds across containers. Uses Redis' clock.
+    """
+
+    def __init__(self, client, prefix: str = "autobook:ratelimit:"):
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_REDIS_RESERVE)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisStore":
+        import redis  # optional dependency, only needed for shared limits
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def reserve(self, key: str, rate: float, burst: float) -> float:
+        ttl = max(60, int(burst / rate) + 60)
+        wait = self._script(keys=[self._prefix + key], args=[rate, burst, ttl])
+        return float(wait)
+
+
+class RateLimiter:
+    """
+    Paces calls per provider name to `rates[provider]` requests/second.
+    Providers without a configured rate are not limited.
+    """
+
+    def __init__(
+        self,
+        rates: Dict[str, float],
+        store=None,
+        burst: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rates = {name: rate for name, rate in rates.items() if rate and rate > 0}
+        self.store = store if store is not None else MemoryStore()
+        self.burst = burst
+        self._sleep = sleep
+
+    def acquire(self, provider: str) -> float:
+        """Block until `provider` may be called; return the time waited."""
+        rate = self.rates.get(provider)
+        if rate is None:
+            return 0.0
+        try:
+            wait = self.store.reserve(provider, rate, self.burst)
+        except Exception as exc:  # e.g. Redis unavailable: degrade to unpaced
+            logger.warning("Rate limiter store failed for %s: %s", provider, exc)
+            return 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def configure(rates: Dict[str, float], redis_url: Optional[str] = None, burst: float = 1.0) -> RateLimiter:
+    """Install the shared limiter; with `redis_url` the buckets live in Redis."""
+    global _limiter
+    store = RedisStore.from_url(redis_url) if redis_url else MemoryStore()
+    _limiter = RateLimiter(rates, store=store, burst=burst)
+    return _limiter
+
+
+def throttle(provider: str) -> float:
+    """
+    Wait for a slot for `provider` on the shared limiter (no-op if unset).
+    Raises LookupCancelled, before taking a token and again after waiting
+    for it, if the calling lookup was cancelled.
+    """
+    check_cancelled()
+    limiter = _limiter
+    waited = limiter.acquire(provider) if limiter is not None else 0.0
+    if waited:
+        check_cancelled()
+    return waited
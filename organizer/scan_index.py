@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+Tags = Optional[Dict[str, Optional[str]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    tags TEXT,
+    digest TEXT,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_fingerprint ON files (inode, size, mtime_ns);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    files TEXT NOT NULL,
+    generation INTEGER NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Cheap change detector for a file: everything comes from one stat()."""
+    size: int
+    mtime_ns: int
+    inode: int
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result) -> "Fingerprint":
+        return cls(size=st.st_size, mtime_ns=st.st_mtime_ns, inode=st.st_ino)
+
+
+class ScanIndex:
+    """
+    Persistent record of what the scanner saw last time, so a rescan of an
+    unchanged library does not reopen every audio file.
+
+    Two things are remembered:
+      - per directory: its mtime and the audio files / subdirectories it
+        contained. If the directory mtime is unchanged its listing is reused
+        instead of calling scandir again.
+      - per file: its Fingerprint, the tags extracted from it and its
+        content digest (organizer.content_hash). Both are reused whenever
+        the fingerprint still matches. Lookups fall back to
+        (inode, size, mtime) so files the scanner moved into group folders
+        on a previous run are still recognised.
+
+    `tags` of None is a cached "tags could not be read" result.
+
+    Each scan is a generation; `prune(root)` drops entries under root that
+    were not seen in the current generation. Not thread-safe: use it from
+    the scanning thread only.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.executescript(_SCHEMA)
+        try:  # indexes created before content digests existed
+            self._conn.execute("ALTER TABLE files ADD COLUMN digest TEXT")
+        except sqlite3.OperationalError:
+            pass
+        self.generation = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "ScanIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    # -- directories --------------------------------------------------
+
+    def get_listing(self, path: str, mtime_ns: int) -> Optional[Tuple[List[str], List[str]]]:
+        row = self._conn.execute(
+            "SELECT mtime_ns, subdirs, files FROM dirs WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return None
+        self._conn.execute(
+            "UPDATE dirs SET generation = ? WHERE path = ?", (self.generation, path)
+        )
+        return json.loads(row[1]), json.loads(row[2])
+
+    def put_listing(self, path: str, mtime_ns: int, subdirs: List[str], files: List[str]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns, subdirs, files, generation) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (path, mtime_ns, json.dumps(subdirs), json.dumps(files), self.generation),
+        )
+
+    # -- files --------------------------------------------------------
+
+    def get_file(self, path: str, fp: Fingerprint) -> Tuple[bool, Tags, Optional[str]]:
+        """Return (hit, tags, digest). On a hit the entry is refreshed for `path`."""
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, inode, tags, digest FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or Fingerprint(row[0], row[1], row[2]) != fp:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, tags, digest FROM files "
+                "WHERE inode = ? AND size = ? AND mtime_ns = ? LIMIT 1",
+                (fp.inode, fp.size, fp.mtime_ns),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None, None
+        self.hits += 1
+        tags = json.loads(row[3]) if row[3] is not None else None
+        self.put_file(path, fp, tags, row[4])
+        return True, tags, row[4]
+
+    def put_file(self, path: str, fp: Fingerprint, tags: Tags, digest: Optional[str] = None) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, tags, digest, generation) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                fp.size,
+                fp.mtime_ns,
+                fp.inode,
+                json.dumps(tags) if tags is not None else None,
+                digest,
+                self.generation,
+            ),
+        )
+
+    # -- housekeeping -------------------------------------------------
+
+    def prune(self, root: str) -> None:
+        """Forget entries below `root` that the current scan did not touch."""
+        root = os.path.normpath(root)
+        lo, hi = root + os.sep, root + chr(ord(os.sep) + 1)
+        for table in ("files", "dirs"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE ((path >= ? AND path < ?) OR path = ?) "
+                "AND generation != ?",
+                (lo, hi, root, self.generation),
+            )
+        self._conn.commit()
+        logger.info(
+            "Scan index %s: %d cached, %d re-read", self.db_path, self.hits, self.misses
+        )
@@ -0,0 +1,184 @@
+"""
+Minimal, header-only tag reader used for grouping.
+
+Only artist / album / track / disc are extracted. The file is memory-mapped
+and walked by offset, so only the pages holding the ID3v2 frame headers or
+the MP4 atom headers on the way to `moov/udta/meta/ilst` are ever read.
+Picture payloads (APIC, covr) and audio data are skipped over, never
+touched.
+
+Anything unusual (unsynchronised or compressed ID3 frames, unknown
+containers) raises TagProbeError so callers can fall back to mutagen.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+import mmap
+import os
+import struct
+
+TAG_NAMES = ("artist", "album", "track", "disc")
+
+_ID3_FRAMES = {b"TPE1": "artist", b"TALB": "album", b"TRCK": "track", b"TPOS": "disc"}
+_ID3V22_FRAMES = {b"TP1": "artist", b"TAL": "album", b"TRK": "track", b"TPA": "disc"}
+_MP4_ITEMS = {b"\xa9ART": "artist", b"\xa9alb": "album", b"trkn": "track", b"disk": "disc"}
+
+Tags = Dict[str, Optional[str]]
+
+
+class TagProbeError(ValueError):
+    """The probe cannot handle this file; use a full tag parser instead."""
+
+
+def probe_tags(path: Union[str, Path]) -> Optional[Tags]:
+    """
+    Return {"artist", "album", "track", "disc"} for an MP3/MP4 file (values
+    may be None), or None for an MP3 without an ID3v2 tag.
+    """
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size < 10:
+            raise TagProbeError(f"{path}: file too small")
+        try:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            raise TagProbeError(f"{path}: cannot mmap ({exc})") from exc
+        with buf:
+            if buf[:3] == b"ID3":
+                return _probe_id3(buf)
+            if buf[4:8] == b"ftyp":
+                return _probe_mp4(buf)
+    if str(path).lower().endswith(".mp3"):
+        return None
+    raise TagProbeError(f"{path}: unrecognised container")
+
+
+# -- ID3v2 ------------------------------------------------------------------
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_text(body: bytes) -> Optional[str]:
+    if not body:
+        return None
+    encoding = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}.get(body[0])
+    if encoding is None:
+        raise TagProbeError(f"unknown ID3 text encoding {body[0]}")
+    text = body[1:].decode(encoding, errors="replace")
+    # Multiple values are NUL-separated (v2.4); keep the first like EasyID3 does
+    return text.split("\x00")[0].strip() or None
+
+
+def _probe_id3(buf: mmap.mmap) -> Tags:
+    major, flags = buf[3], buf[5]
+    if major not in (2, 3, 4):
+        raise TagProbeError(f"unsupported ID3v2.{major}")
+    if flags & 0x80:
+        raise TagProbeError("unsynchronised ID3 tag")
+
+    end = min(10 + _syncsafe(buf[6:10]), len(buf))
+    pos = 10
+    if flags & 0x40 and major == 3:
+        pos += 4 + struct.unpack(">I", buf[10:14])[0]
+    elif flags & 0x40 and major == 4:
+        pos += _syncsafe(buf[10:14])
+
+    if major == 2:
+        id_len, header_len, frames = 3, 6, _ID3V22_FRAMES
+    else:
+        id_len, header_len, frames = 4, 10, _ID3_FRAMES
+
+    tags: Tags = dict.fromkeys(TAG_NAMES)
+    found = 0
+    while pos + header_len <= end and found < len(frames):
+        frame_id = buf[pos:pos + id_len]
+        if frame_id[0] == 0:  # padding
+            break
+        if major == 2:
+            size = int.from_bytes(buf[pos + 3:pos + 6], "big")
+        elif major == 3:
+            size = struct.unpack(">I", buf[pos + 4:pos + 8])[0]
+        else:
+            size = _syncsafe(buf[pos + 4:pos + 8])
+        body_start = pos + header_len
+        name = frames.get(frame_id)
+        if name is not None and size > 0:
+            body_start_data = body_start
+            if major == 3 and buf[pos + 9] & 0xE0:
+                raise TagProbeError("compressed/encrypted ID3 frame")
+            if major == 4:
+                frame_flags = buf[pos + 9]
+                if frame_flags & 0x4E:
+                    raise TagProbeError("transformed ID3 frame")
+                if frame_flags & 0x01:  # data length indicator
+                    body_start_data += 4
+            tags[name] = _decode_text(buf[body_start_data:body_start + size])
+            found += 1
+        pos = body_start + size
+    return tags
+
+
+# -- MP4 --------------------------------------------------------------------
+
+def _atoms(buf: mmap.mmap, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (kind, payload_start, atom_end) for the atoms in [start, end)."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", buf[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", buf[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise TagProbeError(f"corrupt MP4 atom {kind!r} at {pos}")
+        atom_end = min(pos + size, end)  # tolerate truncated trailing mdat
+        yield kind, pos + header, atom_end
+        pos = atom_end
+
+
+def _child(buf: mmap.mmap, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child_kind, child_start, child_end in _atoms(buf, start, end):
+        if child_kind == kind:
+            return child_start, child_end
+    return None
+
+
+def _find_ilst(buf: mmap.mmap) -> Optional[Tuple[int, int]]:
+    moov = _child(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise TagProbeError("MP4 without moov atom")
+    udta = _child(buf, *moov, b"udta")
+    meta = _child(buf, *udta, b"meta") if udta else _child(buf, *moov, b"meta")
+    if meta is None:
+        return None
+    start, end = meta
+    # `meta` is normally a full box (4 bytes version/flags before children),
+    # but some QuickTime writers omit them.
+    if buf[start + 4:start + 8] != b"hdlr":
+        start += 4
+    return _child(buf, start, end, b"ilst")
+
+
+def _probe_mp4(buf: mmap.mmap) -> Tags:
+    tags: Tags = dict.fromkeys(TAG_NAMES)
+    ilst = _find_ilst(buf)
+    if ilst is None:
+        return tags
+    for kind, start, end in _atoms(buf, *ilst):
+        name = _MP4_ITEMS.get(kind)
+        if name is None:  # includes covr, which is never read
+            continue
+        data = _child(buf, start, end, b"data")
+        if data is None:
+            continue
+        payload = buf[data[0] + 8:data[1]]  # skip type/flags + locale
+        if name in ("track", "disc"):
+            if len(payload) >= 4:
+                tags[name] = str(struct.unpack(">H", payload[2:4])[0])
+        else:
+            tags[name] = payload.decode("utf-8", errors="replace").strip() or None
+    return tags
@@ -0,0 +1,35 @@
+"""Small audio/image fixtures generated with ffmpeg for the muxer and cover tests."""
+
+from pathlib import Path
+import shutil
+import subprocess
+
+from organizer.encoder_profiles import FFMPEG
+
+HAVE_FFMPEG = shutil.which(FFMPEG) is not None
+
+
+def _ffmpeg(*args):
+    subprocess.run([FFMPEG, "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *args], check=True)
+
+
+def tone(path, seconds=1.0, codec="mp3", sample_rate=44100, tags=None):
+    """A sine tone as MP3 (codec="mp3") or AAC in an MP4 container (codec="aac")."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    args = ["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}:sample_rate={sample_rate}"]
+    for key, value in (tags or {}).items():
+        args += ["-metadata", f"{key}={value}"]
+    if codec == "mp3":
+        args += ["-c:a", "libmp3lame", str(path)]
+    else:
+        args += ["-c:a", "aac", "-f", "ipod", str(path)]
+    _ffmpeg(*args)
+    return path
+
+
+def image(path, width, height):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ffmpeg("-f", "lavfi", "-i", f"color=c=red:s={width}x{height}", "-frames:v", "1", str(path))
+    return path
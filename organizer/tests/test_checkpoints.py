@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from organizer.checkpoints import BookCheckpoint, CheckpointStore
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = os.path.join(tmp.name, "checkpoints.sqlite3")
+        self.store = CheckpointStore(self.db)
+        self.addCleanup(self.store.close)
+
+    def test_progress_survives_a_new_store(self):
+        book = self.store.book(7, "/in/Book")
+        book.mark("scanned")
+        book.mark("enriched", metadata={"title": "Book"})
+        with CheckpointStore(self.db) as other:
+            resumed = other.book(7, "/in/Book")
+            self.assertTrue(resumed.reached("enriched"))
+            self.assertFalse(resumed.reached("converted"))
+            self.assertEqual(resumed.data, {"metadata": {"title": "Book"}})
+
+    def test_stages_never_move_backwards(self):
+        book = self.store.book(7, "/in/Book")
+        book.mark("converted", output="/out/a.m4b")
+        book.mark("enriched", extra=1)
+        self.assertEqual(book.stage, "converted")
+        self.assertEqual(self.store.book(7, "/in/Book").data, {"output": "/out/a.m4b", "extra": 1})
+
+    def test_clear_forgets_only_that_job(self):
+        self.store.book(1, "/in/Book").mark("archived")
+        self.store.book(2, "/in/Book").mark("archived")
+        self.store.clear(1)
+        self.assertIsNone(self.store.book(1, "/in/Book").stage)
+        self.assertEqual(self.store.book(2, "/in/Book").stage, "archived")
+
+    def test_without_a_store_progress_is_in_memory(self):
+        book = BookCheckpoint("/in/Book")
+        self.assertFalse(book.reached("scanned"))
+        book.mark("scanned")
+        self.assertTrue(book.reached("scanned"))
+        self.assertIsNone(BookCheckpoint("/in/Book").stage)
+
+
+class ClaimTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = CheckpointStore(os.path.join(tmp.name, "checkpoints.sqlite3"))
+        self.addCleanup(self.store.close)
+
+    def test_one_book_holds_a_target(self):
+        first, second = self.store.book(1, "/in/a"), self.store.book(2, "/in/b")
+        self.assertTrue(first.claim("/out/A - B.m4b"))
+        self.assertTrue(first.claim("/out/A - B.m4b"))
+        self.assertFalse(second.claim("/out/A - B.m4b"))
+        first.release()
+        self.assertTrue(second.claim("/out/A - B.m4b"))
+
+    def test_clearing_a_job_drops_its_claims(self):
+        self.store.book(1, "/in/a").claim("/out/x.m4b")
+        self.store.clear(1)
+        self.assertTrue(self.store.book(2, "/in/b").claim("/out/x.m4b"))
+
+    def test_stale_claims_are_taken_over(self):
+        self.assertTrue(self.store.claim("/out/x.m4b", 1, "/in/a"))
+        self.assertFalse(self.store.claim("/out/x.m4b", 2, "/in/b"))
+        self.assertTrue(self.store.claim("/out/x.m4b", 2, "/in/b", ttl=-1))
+
+    def test_in_memory_claims(self):
+        first, second = BookCheckpoint("/in/mem-a"), BookCheckpoint("/in/mem-b")
+        self.addCleanup(first.release)
+        self.addCleanup(second.release)
+        self.assertTrue(first.claim("/out/mem.m4b"))
+        self.assertFalse(second.claim("/out/mem.m4b"))
+        first.release()
+        self.assertTrue(second.claim("/out/mem.m4b"))
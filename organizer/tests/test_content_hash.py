@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from organizer.content_hash import book_digest, file_digest
+
+
+class ContentHashTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return path, len(data)
+
+    def test_same_contents_same_digest(self):
+        a = file_digest(*self.write("a.mp3", b"x" * 1000))
+        b = file_digest(*self.write("b.mp3", b"x" * 1000))
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, file_digest(*self.write("c.mp3", b"y" * 1000)))
+
+    def test_large_files_are_sampled(self):
+        data = bytearray(os.urandom(1024) * 1024)
+        path, size = self.write("big.mp3", bytes(data))
+        digest = file_digest(path, size, block_size=1024, samples=4)
+        data[5000] ^= 0xFF  # between two sampled blocks
+        self.write("big.mp3", bytes(data))
+        self.assertEqual(file_digest(path, size, block_size=1024, samples=4), digest)
+        data[0] ^= 0xFF  # inside the first sampled block
+        self.write("big.mp3", bytes(data))
+        self.assertNotEqual(file_digest(path, size, block_size=1024, samples=4), digest)
+
+    def test_unreadable_file_has_no_digest(self):
+        self.assertIsNone(file_digest(os.path.join(self.dir, "missing.mp3"), 10))
+
+    def test_book_digest_ignores_order_and_needs_every_file(self):
+        self.assertEqual(book_digest(["a", "b"]), book_digest(["b", "a"]))
+        self.assertNotEqual(book_digest(["a", "b"]), book_digest(["a", "c"]))
+        self.assertIsNone(book_digest(["a", None]))
+        self.assertIsNone(book_digest([]))
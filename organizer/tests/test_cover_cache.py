@@ -0,0 +1,73 @@
+import re
+import subprocess
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from organizer.cover_cache import CoverCache
+from organizer.encoder_profiles import FFMPEG
+
+from .media import HAVE_FFMPEG, image
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = self.server.files.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+    def log_message(self, *args):
+        pass
+
+
+def dimensions(path):
+    result = subprocess.run([FFMPEG, "-hide_banner", "-i", str(path)], capture_output=True, text=True)
+    width, height = re.search(r"Video: .*?, (\d+)x(\d+)", result.stderr).groups()
+    return int(width), int(height)
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+class CoverCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.requests = []
+        self.server.files = {
+            "/big.jpg": image(self.dir / "big.jpg", 400, 200).read_bytes(),
+            "/small.jpg": image(self.dir / "small.jpg", 40, 30).read_bytes(),
+            "/text": b"not an image",
+        }
+        self.server.files["/same.jpg"] = self.server.files["/big.jpg"]
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.cache = CoverCache(self.dir / "covers", max_dimension=100)
+
+    def test_covers_are_downscaled_but_never_enlarged(self):
+        self.assertEqual(dimensions(self.cache.fetch(f"{self.url}/big.jpg")), (100, 50))
+        self.assertEqual(dimensions(self.cache.fetch(f"{self.url}/small.jpg")), (40, 30))
+
+    def test_urls_are_downloaded_once_and_same_bytes_stored_once(self):
+        first = self.cache.fetch(f"{self.url}/big.jpg")
+        self.assertEqual(self.cache.fetch(f"{self.url}/big.jpg"), first)
+        self.assertEqual(self.server.requests, ["/big.jpg"])
+        self.assertEqual(self.cache.fetch(f"{self.url}/same.jpg"), first)
+        self.assertEqual(len(list((self.dir / "covers" / "objects").rglob("*.jpg"))), 1)
+
+        reopened = CoverCache(self.dir / "covers", max_dimension=100)
+        self.assertEqual(reopened.lookup(f"{self.url}/same.jpg"), first)
+
+    def test_failures_return_none(self):
+        self.assertIsNone(self.cache.fetch(None))
+        self.assertIsNone(self.cache.fetch(f"{self.url}/missing.jpg"))
+        self.assertIsNone(self.cache.fetch(f"{self.url}/text"))
+        self.assertIsNone(self.cache.lookup(f"{self.url}/text"))
+        self.assertEqual([p for p in (self.dir / "covers" / "objects").rglob("*") if p.is_file()], [])
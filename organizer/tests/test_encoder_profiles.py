@@ -0,0 +1,35 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from organizer.encoder_profiles import DEFAULT_PROFILE, PROFILE_CHOICES, PROFILES, benchmark, get_profile
+
+from .media import HAVE_FFMPEG, tone
+
+
+class EncoderProfileTests(unittest.TestCase):
+    def test_lookup(self):
+        self.assertEqual(get_profile("fast").name, "fast")
+        self.assertEqual(get_profile(None).name, DEFAULT_PROFILE)
+        self.assertEqual(get_profile("").name, DEFAULT_PROFILE)
+        self.assertEqual([name for name, _ in PROFILE_CHOICES], list(PROFILES))
+
+    def test_unknown_profile_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "unknown encoder profile 'turbo'"):
+            get_profile("turbo")
+
+    def test_profiles_encode_aac(self):
+        for profile in PROFILES.values():
+            args = list(profile.audio_args)
+            self.assertEqual(args[args.index("-c:a") + 1], "aac", profile.name)
+
+    @unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+    def test_benchmark_reports_every_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sample = tone(Path(tmp) / "sample.mp3", 1.0)
+            results = benchmark(sample, ["fast", "archive"])
+        self.assertEqual([r.profile for r in results], ["fast", "archive"])
+        for result in results:
+            self.assertGreater(result.output_bytes, 0)
+            self.assertAlmostEqual(result.audio_seconds, 1.0, delta=0.1)
+            self.assertGreater(result.speed, 0)
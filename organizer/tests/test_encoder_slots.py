@@ -0,0 +1,67 @@
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from organizer import encoder_slots
+from organizer.encoder_slots import EncoderSlots
+
+
+class EncoderSlotsTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.lock_dir = tmp.name
+
+    def test_takes_at_most_the_free_slots(self):
+        slots = EncoderSlots(self.lock_dir, 3, poll=0.01)
+        with slots.acquire(2) as first:
+            self.assertEqual(first, 2)
+            with EncoderSlots(self.lock_dir, 3).acquire(5) as second:
+                self.assertEqual(second, 1)
+
+    def test_waits_until_a_slot_is_released(self):
+        slots = EncoderSlots(self.lock_dir, 1, poll=0.01)
+        got = threading.Event()
+
+        def worker():
+            with slots.acquire():
+                got.set()
+
+        with slots.acquire():
+            thread = threading.Thread(target=worker)
+            thread.start()
+            self.assertFalse(got.wait(0.1))
+        self.assertTrue(got.wait(2))
+        thread.join()
+
+    def test_slots_are_shared_with_other_processes(self):
+        code = (
+            "import sys, time\n"
+            "from organizer.encoder_slots import EncoderSlots\n"
+            "with EncoderSlots(sys.argv[1], 1).acquire():\n"
+            "    print('held', flush=True)\n"
+            "    time.sleep(60)\n"
+        )
+        proc = subprocess.Popen([sys.executable, "-c", code, self.lock_dir], stdout=subprocess.PIPE, text=True)
+        self.addCleanup(proc.wait)
+        self.addCleanup(proc.kill)
+        self.assertEqual(proc.stdout.readline().strip(), "held")
+        slots = EncoderSlots(self.lock_dir, 1)
+        self.assertEqual(slots._try_take(1), [])
+
+        # A killed holder gives its slot back
+        proc.kill()
+        proc.wait()
+        with slots.acquire() as held:
+            self.assertEqual(held, 1)
+
+    def test_disabled_scheduler_grants_everything(self):
+        self.addCleanup(encoder_slots.configure, None, 0)
+        encoder_slots.configure(None, 0)
+        with encoder_slots.encoder_slots(4) as held:
+            self.assertEqual(held, 4)
+        encoder_slots.configure(self.lock_dir, 2)
+        with encoder_slots.encoder_slots(4) as held:
+            self.assertEqual(held, 2)
@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from organizer import utils
+from organizer.domain import BookCandidate
+from organizer.enrichment import Provider, enrich_concurrently, group_queries, match_title
+from organizer.metadata_cache import cached_lookup
+from organizer.rate_limit import LookupCancelled, cancellable, throttle
+
+
+def answer(metadata, delay=0.0):
+    def lookup(folder, title, author):
+        time.sleep(delay)
+        return metadata
+    return lookup
+
+
+def failing(folder, title, author):
+    raise ConnectionError("provider down")
+
+
+class EnrichConcurrentlyTests(unittest.TestCase):
+    def test_highest_priority_primary_wins(self):
+        providers = [
+            Provider("first", answer({"title": "From first", "series": None}, delay=0.05)),
+            Provider("second", answer({"title": "From second", "series": "S"})),
+        ]
+        self.assertEqual(enrich_concurrently("/in/Book", "Book", "A", providers), {"title": "From first"})
+
+    def test_failures_and_timeouts_fall_through(self):
+        providers = [
+            Provider("broken", failing),
+            Provider("slow", answer({"title": "Late"}, delay=1.0), timeout=0.05),
+            Provider("backup", answer({"title": "Backup"})),
+        ]
+        self.assertEqual(enrich_concurrently("/in/Book", "Book", "A", providers), {"title": "Backup"})
+
+    def test_supplementary_providers_only_fill_missing_fields(self):
+        providers = [
+            Provider("primary", answer({"title": "Book", "cover": "c1"})),
+            Provider("asin", answer({"asin": "B00", "title": "Other"}), primary=False, fields=frozenset({"asin"})),
+            Provider("cover", answer({"cover": "c2"}), primary=False, fields=frozenset({"cover"})),
+        ]
+        self.assertEqual(
+            enrich_concurrently("/in/Book", "Book", "A", providers),
+            {"title": "Book", "cover": "c1", "asin": "B00"},
+        )
+
+    def test_lookups_run_concurrently(self):
+        providers = [
+            Provider(f"p{i}", answer({"asin": "B00"} if i == 3 else {}, delay=0.2), primary=False, fields=frozenset({"asin"}))
+            for i in range(4)
+        ]
+        started = time.monotonic()
+        self.assertEqual(enrich_concurrently("/in/Book", "Book", "A", providers), {"asin": "B00"})
+        self.assertLess(time.monotonic() - started, 0.6)
+
+    def test_lookups_no_longer_needed_never_reach_the_request(self):
+        requested = []
+
+        def late(name):
+            def lookup(folder, title, author):
+                time.sleep(0.1)
+                throttle(name)
+                requested.append(name)
+                return {"title": name, "cover": name}
+            return lookup
+
+        providers = [
+            Provider("primary", answer({"title": "Book", "cover": "c1"})),
+            Provider("backup", late("backup")),
+            Provider("cover", late("cover"), primary=False, fields=frozenset({"cover"})),
+        ]
+        self.assertEqual(enrich_concurrently("/in/Book", "Book", "A", providers), {"title": "Book", "cover": "c1"})
+        time.sleep(0.2)
+        self.assertEqual(requested, [])
+
+    def test_timed_out_lookup_stops_at_its_throttle(self):
+        requested = []
+
+        def slow(folder, title, author):
+            time.sleep(0.1)
+            throttle("slow")
+            requested.append("slow")
+
+        providers = [Provider("slow", slow, timeout=0.02), Provider("backup", answer({"title": "Backup"}))]
+        self.assertEqual(enrich_concurrently("/in/Book", "Book", "A", providers), {"title": "Backup"})
+        time.sleep(0.2)
+        self.assertEqual(requested, [])
+
+    def test_cancellation_is_not_cached_as_a_failure(self):
+        calls = []
+
+        @cached_lookup("cancel-test")
+        def lookup(title, author):
+            calls.append(title)
+            throttle("cancel-test")
+            return "value"
+
+        cancel = threading.Event()
+        cancel.set()
+        with cancellable(cancel), self.assertRaises(LookupCancelled):
+            lookup("Book", "A")
+        self.assertEqual(lookup("Book", "A"), "value")
+        self.assertEqual(calls, ["Book", "Book"])
+
+
+class MatchTitleTests(unittest.TestCase):
+    VOLUMES = [{"title": "Dune Messiah"}, {"title": "The Institute"}, {"title": "Children of Dune"}]
+
+    def test_exact_normalized_match(self):
+        volumes = self.VOLUMES + [{"title": "DUNE!"}]
+        self.assertEqual(match_title("Dune", volumes), {"title": "DUNE!"})
+
+    def test_substrings_are_not_matches(self):
+        self.assertIsNone(match_title("Dune", self.VOLUMES))
+        self.assertIsNone(match_title("It", self.VOLUMES))
+
+    def test_near_matches_need_a_high_word_similarity(self):
+        volume = {"title": "Harry Potter and the Chamber of Secrets (Illustrated Edition)"}
+        self.assertEqual(match_title("Harry Potter and the Chamber of Secrets: Illustrated", [volume]), volume)
+        self.assertIsNone(match_title("Harry Potter and the Chamber of Secrets", [volume]))
+
+    def test_numbers_must_agree(self):
+        volume = {"title": "The Wheel of Time Book 2 The Great Hunt of the World"}
+        self.assertIsNone(match_title("The Wheel of Time Book 3 The Great Hunt of the World", [volume]))
+
+
+class GroupQueriesTests(unittest.TestCase):
+    def test_distinct_queries_grouped_by_author(self):
+        groups = group_queries([("Dune", "Frank Herbert"), ("dune", "FRANK HERBERT"), ("Emma", "Unknown"),
+                                ("Dune Messiah", "Frank Herbert")])
+        self.assertEqual(groups, {
+            "frank herbert": [("Dune", "Frank Herbert"), ("Dune Messiah", "Frank Herbert")],
+            "": [("Emma", "Unknown")],
+        })
+
+
+class EnrichBooksTests(unittest.TestCase):
+    def candidate(self, folder):
+        return BookCandidate(id=folder, raw_title_hint=folder, source_dir=Path("/in") / folder)
+
+    def test_author_volumes_replace_per_book_google_queries(self):
+        google_calls = []
+
+        def google(folder, title, author):
+            google_calls.append(title)
+            return {"title": f"{title} (google)"}
+
+        providers = [Provider("google-books", google)]
+        candidates = [self.candidate(f) for f in (
+            "Frank Herbert - Dune Messiah", "Frank Herbert - Dune", "Frank Herbert - Dune Messiah (2)",
+        )]
+        volumes = [{"title": "Dune Messiah", "author": "Frank Herbert"}]
+        with mock.patch.object(utils, "fetch_author_volumes_google_books", return_value=volumes) as by_author:
+            books = utils.enrich_books(candidates, providers=providers, workers=2)
+        by_author.assert_called_once_with("Frank Herbert")
+        self.assertEqual([b.title for b in books], ["Dune Messiah", "Dune (google)", "Dune Messiah (2) (google)"])
+        self.assertEqual(sorted(google_calls), ["Dune", "Dune Messiah (2)"])
+
+    def test_identical_queries_are_looked_up_once(self):
+        calls = []
+
+        def google(folder, title, author):
+            calls.append(title)
+            return {"title": title}
+
+        candidates = [self.candidate("Jane Doe - Book"), self.candidate("jane doe - BOOK")]
+        books = utils.enrich_books(candidates, providers=[Provider("google-books", google)])
+        self.assertEqual(calls, ["Book"])
+        self.assertEqual([b.candidate for b in books], candidates)
@@ -0,0 +1,80 @@
+import errno
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from organizer import fs_ops
+
+
+def cross_device(src, dst):
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+class MoveTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def make(self, rel, data=b"audio"):
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def test_move_file_renames_and_creates_parents(self):
+        src = self.make("in/a.m4b")
+        dst = fs_ops.move_file(src, self.root / "out/Author/Book/a.m4b")
+        self.assertEqual(dst.read_bytes(), b"audio")
+        self.assertFalse(src.exists())
+
+    def test_move_file_across_devices_copies_and_replaces(self):
+        src = self.make("in/a.m4b", b"new")
+        os.utime(src, (1_000_000, 1_000_000))
+        dst = self.make("out/a.m4b", b"old")
+        with mock.patch.object(fs_ops.os, "rename", cross_device), \
+                mock.patch.object(fs_ops, "reflink", return_value=False), \
+                self.assertLogs("organizer.fs_ops", "WARNING"):
+            fs_ops.move_file(src, dst)
+        self.assertEqual(dst.read_bytes(), b"new")
+        self.assertEqual(dst.stat().st_mtime, 1_000_000)
+        self.assertFalse(src.exists())
+        self.assertEqual(os.listdir(dst.parent), ["a.m4b"])  # no .part left behind
+
+    def test_move_file_prefers_a_reflink_across_devices(self):
+        src = self.make("in/a.m4b")
+
+        def clone(s, d):
+            Path(d).write_bytes(Path(s).read_bytes())
+            return True
+
+        with mock.patch.object(fs_ops.os, "rename", cross_device), \
+                mock.patch.object(fs_ops, "reflink", side_effect=clone) as reflink, \
+                mock.patch.object(fs_ops.shutil, "copy2") as copy2:
+            fs_ops.move_file(src, self.root / "out/a.m4b")
+        reflink.assert_called_once()
+        copy2.assert_not_called()
+        self.assertEqual((self.root / "out/a.m4b").read_bytes(), b"audio")
+
+    def test_other_rename_errors_propagate(self):
+        with self.assertRaises(FileNotFoundError):
+            fs_ops.move_file(self.root / "missing.m4b", self.root / "out/a.m4b")
+
+    def test_move_tree_across_devices_moves_every_file(self):
+        self.make("in/Book/01.mp3", b"1")
+        self.make("in/Book/CD2/02.mp3", b"2")
+        with mock.patch.object(fs_ops.os, "rename", cross_device), \
+                mock.patch.object(fs_ops, "reflink", return_value=False), \
+                self.assertLogs("organizer.fs_ops"):
+            fs_ops.move_tree(self.root / "in/Book", self.root / "archive/Book")
+        self.assertFalse((self.root / "in/Book").exists())
+        self.assertEqual((self.root / "archive/Book/01.mp3").read_bytes(), b"1")
+        self.assertEqual((self.root / "archive/Book/CD2/02.mp3").read_bytes(), b"2")
+
+    def test_reflink_failure_leaves_no_file(self):
+        src = self.make("in/a.m4b")
+        with mock.patch.object(fs_ops.fcntl, "ioctl", side_effect=OSError(errno.EOPNOTSUPP, "no")):
+            self.assertFalse(fs_ops.reflink(src, self.root / "clone.m4b"))
+        self.assertFalse((self.root / "clone.m4b").exists())
@@ -0,0 +1,68 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from organizer import http_client
+from organizer.http_client import build_session
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.client_address[1], self.headers.get("User-Agent")))
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b"ok"
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.requests, self.server.statuses = [], []
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.session = build_session(retries=2, backoff=0)
+        self.addCleanup(self.session.close)
+
+    def test_requests_reuse_one_connection(self):
+        for i in range(3):
+            self.assertEqual(self.session.get(f"{self.url}/{i}").text, "ok")
+        ports = {port for _, port, _ in self.server.requests}
+        self.assertEqual(len(ports), 1)
+        self.assertEqual(self.server.requests[0][2], http_client.USER_AGENT)
+
+    def test_throttling_and_server_errors_are_retried(self):
+        self.server.statuses = [429, 503]
+        response = self.session.get(f"{self.url}/book")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_gives_up_after_the_configured_retries(self):
+        self.server.statuses = [503] * 5
+        self.assertEqual(self.session.get(f"{self.url}/book").status_code, 503)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_adapters_apply_the_default_timeout(self):
+        session = build_session(timeout=(1.0, 2.0), per_host_connections=3)
+        self.addCleanup(session.close)
+        adapter = session.get_adapter("https://www.googleapis.com")
+        self.assertEqual(adapter.timeout, (1.0, 2.0))
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_configure_replaces_the_shared_session(self):
+        first = http_client.configure(retries=0)
+        self.addCleanup(http_client.configure)
+        self.assertIs(http_client.get_session(), first)
+        self.assertIsNot(http_client.configure(), first)
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import unittest
+
+if not os.environ.get("DJANGO_SETTINGS_MODULE"):
+    raise unittest.SkipTest("Django-side tests run with `python manage.py test`")
+
+from django.test import TestCase, TransactionTestCase
+
+from autobook.job_log import JobLogWriter
+from organizer.models import Job, Log
+
+
+def messages(job):
+    return list(Log.objects.filter(job=job).order_by("id").values_list("message", flat=True))
+
+
+class JobLogWriterTests(TestCase):
+    def setUp(self):
+        self.job = Job.objects.create(input_path="/input", output_path="/output")
+
+    def test_rows_are_written_once_a_batch_is_full(self):
+        log = JobLogWriter(self.job.id, batch_size=3, flush_seconds=60)
+        log.add("a")
+        log.add("b")
+        self.assertEqual(messages(self.job), [])
+        log.add("c", book="Book", stage="convert", duration=1.5)
+        self.assertEqual(messages(self.job), ["a", "b", "c"])
+        row = Log.objects.get(job=self.job, message="c")
+        self.assertEqual((row.book, row.stage, row.duration), ("Book", "convert", 1.5))
+
+    def test_ids_follow_the_order_rows_were_added(self):
+        log = JobLogWriter(self.job.id, batch_size=4, flush_seconds=60)
+        for i in range(10):
+            log.add(f"row {i}")
+        log.close()
+        self.assertEqual(messages(self.job), [f"row {i}" for i in range(10)])
+
+
+class JobLogWriterThreadTests(TransactionTestCase):
+    # The flush thread writes through its own database connection
+    def setUp(self):
+        self.job = Job.objects.create(input_path="/input", output_path="/output")
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(messages(self.job)) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return messages(self.job)
+
+    def test_buffered_rows_are_flushed_on_a_timer(self):
+        with JobLogWriter(self.job.id, batch_size=100, flush_seconds=0.1) as log:
+            log.add("first")
+            self.assertEqual(self.wait_for(1), ["first"])
+            log.add("second")
+            self.assertEqual(self.wait_for(2), ["first", "second"])
+
+    def test_concurrent_writers_keep_their_order(self):
+        def write(name):
+            for i in range(20):
+                log.add(f"{name} {i}")
+
+        with JobLogWriter(self.job.id, batch_size=7, flush_seconds=0.1) as log:
+            threads = [threading.Thread(target=write, args=(name,)) for name in "abc"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        rows = messages(self.job)
+        self.assertEqual(len(rows), 60)
+        for name in "abc":
+            self.assertEqual([r for r in rows if r.startswith(name)], [f"{name} {i}" for i in range(20)])
+
+    def test_tail_is_written_when_the_job_fails(self):
+        with self.assertRaises(RuntimeError):
+            with JobLogWriter(self.job.id, batch_size=100, flush_seconds=60) as log:
+                log.add("before the error")
+                raise RuntimeError("conversion failed")
+        self.assertEqual(messages(self.job), ["before the error"])
+        self.assertIsNone(log._thread)
@@ -0,0 +1,144 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from organizer.checkpoints import CheckpointStore, ClaimError
+from organizer.domain import BookCandidate, EnrichedBook
+from organizer.library_index import LibraryIndex
+from organizer.pipeline import PipelineLimits, run_stages
+from organizer.utils import BookWork, _library_step, book_stages, plan_layout, process_audiobook_folder
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"m4b")
+    return path
+
+
+class LibraryIndexTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+
+    def test_finds_books_by_normalized_title_and_author(self):
+        book = touch(self.root / "Ursula K. Le Guin" / "Earthsea" / "A Wizard of Earthsea" / "x.m4b")
+        touch(self.root / "archive" / "Someone" / "Old Book" / "old.m4b")
+        touch(self.root / "Loose.m4b")
+        index = LibraryIndex(self.root)
+        self.assertEqual(index.find("a wizard of earthsea", "Ursula K Le Guin"), book)
+        self.assertIsNone(index.find("Old Book", "Someone"))
+        self.assertIsNone(index.find("Loose", ""))
+
+    def test_add_discard_and_deleted_files(self):
+        index = LibraryIndex(self.root)
+        self.assertIsNone(index.find("Café", "Author"))  # builds the index
+        path = touch(self.root / "Author" / "Café" / "b.m4b")
+        self.assertIsNone(index.find("Café", "Author"))  # not walked again
+        index.add("Café", "Author", path)
+        self.assertEqual(index.find("Cafe", "author"), path)
+        index.discard("Café", "Author", path)
+        self.assertIsNone(index.find("Café", "Author"))
+
+        index.add("Gone", "Author", self.root / "missing.m4b")
+        self.assertIsNone(index.find("Gone", "Author"))
+
+
+class LibraryStepTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.store = CheckpointStore(self.dir / "checkpoints.sqlite3")
+        self.addCleanup(self.store.close)
+
+    def plan(self, folder, title="Book", author="Author"):
+        candidate = BookCandidate(id=folder, raw_title_hint=title, source_dir=self.dir / "in" / folder)
+        return plan_layout(EnrichedBook(candidate=candidate, title=title, author=author), self.dir / "out")
+
+    def step(self, folder, policy, job_id=1):
+        plan = self.plan(folder)
+        checkpoint = self.store.book(job_id, folder)
+        return _library_step(plan, checkpoint, policy), checkpoint
+
+    def test_new_book_claims_its_target(self):
+        plan, checkpoint = self.step("a", "skip")
+        self.assertFalse(checkpoint.reached("finalized"))
+        self.assertEqual(checkpoint.data["output_file"], str(plan.output_file))
+
+    def test_existing_book_is_skipped_versioned_or_replaced(self):
+        existing = touch(self.plan("a").output_file)
+
+        plan, checkpoint = self.step("skip", "skip")
+        self.assertEqual(plan.output_file, existing)
+        self.assertTrue(checkpoint.data["skipped"])
+
+        plan, checkpoint = self.step("version", "version")
+        self.assertEqual(plan.output_file.name, f"{existing.stem} (2).m4b")
+
+        plan, checkpoint = self.step("replace", "replace")
+        self.assertEqual(plan.output_file, existing)
+        self.assertEqual(checkpoint.data["replaces"], str(existing))
+        self.assertFalse(checkpoint.reached("finalized"))
+
+    def test_concurrent_books_with_one_target(self):
+        first, _ = self.step("a", "skip", job_id=1)
+
+        with self.assertRaises(ClaimError):
+            self.step("b", "skip", job_id=2)
+        checkpoint = self.store.book(2, "b")
+        self.assertFalse(checkpoint.reached("finalized"))
+
+        plan, checkpoint = self.step("c", "version", job_id=3)
+        self.assertEqual(plan.output_file.name, f"{first.output_file.stem} (2).m4b")
+
+        # Once the holder placed its file, the book is in the library
+        touch(first.output_file)
+        plan, checkpoint = self.step("b", "skip", job_id=2)
+        self.assertTrue(checkpoint.data["skipped"])
+        self.assertEqual(plan.output_file, first.output_file)
+
+    def test_claim_of_a_failed_book_is_released(self):
+        source = self.dir / "in" / "a"
+        source.mkdir(parents=True)
+        metadata = {"title": "Book", "author": "Author"}
+        first = self.store.book(1, str(source))
+        with mock.patch("organizer.utils.cache_cover"), \
+                mock.patch("organizer.utils.convert_book", side_effect=OSError("m4b-merge not found")):
+            with self.assertRaises(OSError):
+                process_audiobook_folder(str(source), self.dir / "out", metadata=metadata, checkpoint=first)
+
+        plan, checkpoint = self.step("b", "skip", job_id=2)
+        self.assertFalse(checkpoint.reached("finalized"))
+        self.assertEqual(checkpoint.data["output_file"], str(plan.output_file))
+        self.assertTrue(source.is_dir())
+
+        # The retried book finds the target taken and waits for it instead of skipping
+        with self.assertRaises(ClaimError):
+            _library_step(self.plan("a"), self.store.book(1, str(source)), "skip")
+
+    def test_pipeline_releases_the_claim_of_a_failed_book(self):
+        candidate = BookCandidate(id="a", raw_title_hint="Book", source_dir=self.dir / "in" / "a")
+        checkpoint = self.store.book(1, str(candidate.source_dir))
+        checkpoint.mark("enriched", metadata={"title": "Book", "author": "Author"})
+        stages = book_stages(self.dir / "out", PipelineLimits())
+        with mock.patch("organizer.utils.cache_cover"), \
+                mock.patch("organizer.utils.convert_book", side_effect=OSError("m4b-merge not found")):
+            [result] = run_stages([BookWork(candidate, checkpoint=checkpoint)], stages)
+        self.assertEqual(result.stage, "convert")
+        self.assertIn("m4b-merge not found", result.error)
+        plan, _ = self.step("b", "skip", job_id=2)
+        self.assertEqual(plan.output_file, result.item.plan.output_file)
+
+    def test_versions_are_numbered_from_the_planned_name(self):
+        planned = self.plan("a").output_file
+        touch(planned.with_name(f"{planned.stem} (2).m4b"))  # what the library finds
+        plan, _ = self.step("b", "version")
+        self.assertEqual(plan.output_file.name, f"{planned.stem} (3).m4b")
+
+    def test_resumed_book_keeps_its_decision(self):
+        plan, _ = self.step("a", "version")
+        touch(plan.output_file)
+        again, _ = self.step("a", "version")
+        self.assertEqual(again.output_file, plan.output_file)
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from organizer import metadata_cache
+from organizer.metadata_cache import MISS, MetadataCache, cached_lookup, normalize_key
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MetadataCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.clock = Clock()
+        patcher = mock.patch.object(metadata_cache.time, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = MetadataCache(os.path.join(tmp.name, "cache.sqlite3"), ttl=100, negative_ttl=10, max_entries=5)
+        self.addCleanup(self.cache.close)
+
+    def test_keys_ignore_case_accents_and_punctuation(self):
+        self.assertEqual(normalize_key("L'Étranger!", " Albert  CAMUS"), normalize_key("l etranger", "albert camus"))
+        self.cache.put("p", "L'Étranger", "Camus", {"title": "x"})
+        self.assertEqual(self.cache.get("p", "l etranger", "CAMUS"), {"title": "x"})
+
+    def test_positive_entries_expire_after_ttl(self):
+        self.cache.put("p", "Book", "Author", {"title": "Book"})
+        self.clock.now += 99
+        self.assertEqual(self.cache.get("p", "Book", "Author"), {"title": "Book"})
+        self.clock.now += 2
+        self.assertIs(self.cache.get("p", "Book", "Author"), MISS)
+
+    def test_negatives_use_the_shorter_ttl(self):
+        self.cache.put("p", "Book", "Author", {})
+        self.assertIsNone(self.cache.get("p", "Book", "Author"))
+        self.clock.now += 11
+        self.assertIs(self.cache.get("p", "Book", "Author"), MISS)
+
+    def test_providers_are_separate(self):
+        self.cache.put("a", "Book", "Author", {"title": "A"})
+        self.assertIs(self.cache.get("b", "Book", "Author"), MISS)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for i in range(99):
+            self.clock.now += 0.01
+            self.cache.put("p", f"Book {i}", "Author", {"n": i})
+        self.clock.now += 0.01
+        self.assertEqual(self.cache.get("p", "Book 0", "Author"), {"n": 0})  # touched: now recent
+        self.clock.now += 0.01
+        self.cache.put("p", "Book 99", "Author", {"n": 99})  # 100th put runs the eviction
+        kept = [i for i in range(100) if self.cache.get("p", f"Book {i}", "Author") is not MISS]
+        self.assertEqual(kept, [0, 96, 97, 98, 99])
+
+
+class CachedLookupTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        metadata_cache.configure(os.path.join(tmp.name, "cache.sqlite3"))
+        self.addCleanup(metadata_cache.configure, None)
+        self.calls = []
+
+    def test_results_and_negatives_are_served_from_the_cache(self):
+        @cached_lookup("p", fallback={})
+        def lookup(title, author):
+            self.calls.append(title)
+            return {"title": title} if title == "Found" else None
+
+        for _ in range(2):
+            self.assertEqual(lookup("Found", "A"), {"title": "Found"})
+            self.assertEqual(lookup("Missing", "A"), {})
+        self.assertEqual(self.calls, ["Found", "Missing"])
+
+    def test_errors_return_the_fallback_and_are_cached_briefly(self):
+        @cached_lookup("p", fallback=[])
+        def lookup(title, author):
+            self.calls.append(title)
+            raise ConnectionError("down")
+
+        with self.assertLogs("organizer.metadata_cache", "WARNING"):
+            self.assertEqual(lookup("Book", "A"), [])
+        self.assertEqual(lookup("Book", "A"), [])
+        self.assertEqual(self.calls, ["Book"])
+        expiry = metadata_cache.get_cache()._conn.execute("SELECT expires_at - last_used FROM lookups").fetchone()[0]
+        self.assertAlmostEqual(expiry, metadata_cache.get_cache().error_ttl, delta=1)
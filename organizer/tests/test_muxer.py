@@ -0,0 +1,212 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from mutagen.mp4 import MP4
+
+from organizer.domain import AudioFile, BookCandidate, EnrichedBook, SourceFormat
+from organizer.muxer import (
+    Chapter, MuxError, book_inputs, build_m4b, can_stream_copy, chapter_titles, chapters_for,
+    duration_ms, ffmetadata, mux_m4b,
+    mux_m4b_segmented, transcode_segment,
+)
+from organizer.utils import convert_book, plan_layout
+
+from .media import HAVE_FFMPEG, image, tone
+
+
+def make_plan(folder, output_root, files=(), **book):
+    candidate = BookCandidate(id="c1", raw_title_hint="Book", source_dir=Path(folder))
+    for f in files:
+        candidate.add_file(f)
+    enriched = EnrichedBook(candidate=candidate, title=book.pop("title", "Book"),
+                            author=book.pop("author", "Author"), **book)
+    return plan_layout(enriched, output_root)
+
+
+class BookInputsTests(unittest.TestCase):
+    def test_orders_by_disc_track_then_natural_name(self):
+        def f(name, disc=None, track=None):
+            return AudioFile(path=Path(name), size_bytes=0, format=SourceFormat.MP3,
+                             disc_number=disc, track_number=track)
+
+        candidate = BookCandidate(id="c", raw_title_hint="Book")
+        for audio in (f("b.mp3", 2, 1), f("a.mp3", 1, 2), f("z.mp3", 1, 1),
+                      f("Track 10.mp3"), f("Track 2.mp3")):
+            candidate.add_file(audio)
+        self.assertEqual([p.name for p in book_inputs(candidate)],
+                         ["Track 2.mp3", "Track 10.mp3", "z.mp3", "a.mp3", "b.mp3"])
+
+    @unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+    def test_bare_folders_are_listed_and_probed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tone(Path(tmp) / "a.mp3", 0.2, tags={"track": "2"})
+            tone(Path(tmp) / "b.mp3", 0.2, tags={"track": "1"})
+            for i in (1, 2, 10):
+                tone(Path(tmp) / f"Track {i}.mp3", 0.2)
+            (Path(tmp) / "notes.txt").write_text("x")
+            candidate = BookCandidate(id="c", raw_title_hint="Book", source_dir=Path(tmp))
+            self.assertEqual([p.name for p in book_inputs(candidate)],
+                             ["Track 1.mp3", "Track 2.mp3", "Track 10.mp3", "b.mp3", "a.mp3"])
+
+
+class ChapterTests(unittest.TestCase):
+    def test_titles_come_from_numbered_names_or_position(self):
+        paths = [Path("/in/01 - Intro.mp3"), Path("/in/track.mp3"), Path("/in/12 - The End.mp3")]
+        self.assertEqual(chapter_titles(paths),
+                         ["Chapter 01 - Intro", "Chapter 02", "Chapter 12 - The End"])
+
+    @unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+    def test_chapters_follow_input_durations_without_touching_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            a = tone(Path(tmp) / "a.mp3", 1.0)
+            b = tone(Path(tmp) / "b.mp3", 2.0)
+            before = [(p.stat().st_mtime_ns, p.read_bytes()) for p in (a, b)]
+            chapters = chapters_for([a, b], ["One", "Two"])
+            self.assertEqual([p.stat().st_mtime_ns for p in (a, b)], [m for m, _ in before])
+            self.assertEqual([p.read_bytes() for p in (a, b)], [d for _, d in before])
+        self.assertEqual([c.title for c in chapters], ["One", "Two"])
+        self.assertEqual(chapters[0].start_ms, 0)
+        self.assertEqual(chapters[0].end_ms, chapters[1].start_ms)
+        self.assertAlmostEqual(chapters[0].end_ms, 1000, delta=100)
+        self.assertAlmostEqual(chapters[1].end_ms, 3000, delta=150)
+
+
+class DurationTests(unittest.TestCase):
+    def test_unreadable_files_raise_mux_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            broken = Path(tmp) / "01.mp3"
+            broken.write_bytes(b"\xff\xfb" + b"\0" * 10)
+            with self.assertRaises(MuxError):
+                duration_ms(broken)
+            with self.assertRaises(MuxError):
+                chapters_for([broken])
+
+    def test_convert_book_falls_back_to_external_tools(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in" / "Book"
+            src.mkdir(parents=True)
+            for name in ("01.mp3", "02.mp3"):
+                (src / name).write_bytes(b"\xff\xfb" + b"\0" * 10)
+            plan = make_plan(src, Path(tmp) / "out")
+            with mock.patch("organizer.utils.subprocess.run") as run:
+                run.return_value.returncode = 0
+                self.assertTrue(convert_book(plan))
+        self.assertIn("/opt/m4binder/m4binder.py", run.call_args.args[0])
+
+
+class FfmetadataTests(unittest.TestCase):
+    def test_special_characters_are_escaped(self):
+        plan = make_plan("/in/Book", "/out", title="A=B; #1", author="C\\D", series="S\nT")
+        text = ffmetadata(plan, [Chapter("x=y", 0, 1000)])
+        self.assertIn("title=A\\=B\\; \\#1\n", text)
+        self.assertIn("artist=C\\\\D\n", text)
+        self.assertIn("grouping=S\\\nT\n", text)
+        self.assertIn("[CHAPTER]\nTIMEBASE=1/1000\nSTART=0\nEND=1000\ntitle=x\\=y\n", text)
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+class MuxTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.src = self.dir / "in" / "Author - Book"
+        for i in (1, 2, 3):
+            tone(self.src / f"0{i} - Part {i}.mp3", 1.0)
+
+    def test_single_pass_mux_writes_tags_chapters_and_cover(self):
+        plan = make_plan(self.src, self.dir / "out", title="Book; One")
+        plan.enriched_book.cover_image_path = image(self.dir / "cover.jpg", 64, 48)
+        out = mux_m4b(plan, plan.output_file)
+        audio = MP4(str(out))
+        self.assertEqual(audio["\xa9nam"], ["Book; One"])
+        self.assertEqual(audio["\xa9ART"], ["Author"])
+        self.assertTrue(audio.get("covr"))
+        self.assertEqual([c.title for c in audio.chapters],
+                         ["Chapter 01 - Part 1", "Chapter 02 - Part 2", "Chapter 03 - Part 3"])
+        self.assertAlmostEqual(audio.info.length, 3.0, delta=0.3)
+        self.assertEqual([p.name for p in out.parent.iterdir()], [out.name])
+
+    def test_failure_raises_and_leaves_nothing_behind(self):
+        plan = make_plan(self.src, self.dir / "out")
+        inputs = [*book_inputs(plan.enriched_book.candidate), self.src / "missing.mp3"]
+        with self.assertRaises(MuxError):
+            mux_m4b(plan, plan.output_file, inputs=inputs, chapters=[Chapter("x", 0, 1000)])
+        self.assertFalse(plan.output_file.exists())
+        self.assertFalse(plan.output_file.with_name(plan.output_file.name + ".part").exists())
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+class StreamCopyTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_only_matching_aac_inputs_are_copied(self):
+        a = tone(self.dir / "a.m4a", 0.3, codec="aac")
+        b = tone(self.dir / "b.m4a", 0.3, codec="aac")
+        other_rate = tone(self.dir / "c.m4a", 0.3, codec="aac", sample_rate=22050)
+        mp3 = tone(self.dir / "d.mp3", 0.3)
+        self.assertTrue(can_stream_copy([a, b]))
+        self.assertFalse(can_stream_copy([a, other_rate]))
+        self.assertFalse(can_stream_copy([a, mp3]))
+
+    def test_aac_book_is_remuxed_with_chapters(self):
+        src = self.dir / "in" / "Book"
+        for i in (1, 2):
+            tone(src / f"0{i} - Part {i}.m4a", 1.0, codec="aac")
+        plan = make_plan(src, self.dir / "out")
+        with self.assertLogs("organizer.muxer", "INFO") as logs:
+            out = mux_m4b(plan, plan.output_file)
+        self.assertIn("stream copy", logs.output[0])
+        self.assertEqual(len(MP4(str(out)).chapters), 2)
+
+    def test_single_m4b_keeps_its_chapters(self):
+        src = self.dir / "in" / "Book"
+        for i in (1, 2, 3):
+            tone(src / f"0{i} - Part {i}.m4a", 0.5, codec="aac")
+        plan = make_plan(src, self.dir / "first")
+        first = mux_m4b(plan, plan.output_file)
+
+        again = make_plan(first.parent, self.dir / "second")
+        out = mux_m4b(again, again.output_file, inputs=[first])
+        self.assertEqual([c.title for c in MP4(str(out)).chapters],
+                         [c.title for c in MP4(str(first)).chapters])
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg not installed")
+class SegmentedMuxTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.src = self.dir / "in" / "Book"
+        for i in (1, 2, 3):
+            tone(self.src / f"0{i} - Part {i}.mp3", 1.0)
+        self.plan = make_plan(self.src, self.dir / "out")
+
+    def test_segments_are_joined_and_cleaned_up(self):
+        out = mux_m4b_segmented(self.plan, self.plan.output_file, workers=2)
+        audio = MP4(str(out))
+        self.assertEqual([c.title for c in audio.chapters],
+                         ["Chapter 01 - Part 1", "Chapter 02 - Part 2", "Chapter 03 - Part 3"])
+        self.assertAlmostEqual(audio.info.length, 3.0, delta=0.3)
+        self.assertEqual([p.name for p in out.parent.iterdir()], [out.name])
+
+    def test_finished_segment_is_kept(self):
+        dest = self.dir / "seg.m4a"
+        dest.write_bytes(b"done earlier")
+        transcode_segment(self.src / "01 - Part 1.mp3", dest)
+        self.assertEqual(dest.read_bytes(), b"done earlier")
+
+    def test_build_m4b_uses_segments_only_with_several_workers(self):
+        with self.assertLogs("organizer.muxer", "INFO") as logs:
+            build_m4b(self.plan, self.plan.output_file, workers=2)
+        self.assertTrue(any("Transcoding 3 segments" in line for line in logs.output))
+
+        with self.assertLogs("organizer.muxer", "INFO") as logs:
+            build_m4b(self.plan, self.dir / "single.m4b", workers=1)
+        self.assertFalse(any("segments" in line for line in logs.output))
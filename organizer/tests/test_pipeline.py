@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+
+from organizer.pipeline import Stage, imap_bounded, run_stages
+
+
+class ImapBoundedTests(unittest.TestCase):
+    def test_yields_every_item_with_its_result(self):
+        pairs = list(imap_bounded(lambda n: n * n, range(20), depth=4))
+        self.assertEqual(sorted(pairs), [(n, n * n) for n in range(20)])
+
+    def test_inline_when_depth_is_one(self):
+        threads = set()
+
+        def record(n):
+            threads.add(threading.current_thread())
+            return n
+
+        self.assertEqual(list(imap_bounded(record, [3, 1, 2], depth=1)), [(3, 3), (1, 1), (2, 2)])
+        self.assertEqual(threads, {threading.current_thread()})
+
+    def test_consumes_items_lazily(self):
+        consumed = []
+
+        def items():
+            for n in range(1000):
+                consumed.append(n)
+                yield n
+
+        results = imap_bounded(lambda n: n, items(), depth=2)
+        next(results)
+        self.assertLessEqual(len(consumed), 2 * 2 + 1)
+
+    def test_runs_calls_concurrently(self):
+        started = time.monotonic()
+        list(imap_bounded(lambda n: time.sleep(0.1), range(8), depth=8))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_exceptions_propagate(self):
+        def fail(n):
+            if n == 3:
+                raise ValueError("bad file")
+            return n
+
+        with self.assertRaises(ValueError):
+            list(imap_bounded(fail, range(10), depth=3))
+
+
+class RunStagesTests(unittest.TestCase):
+    def test_items_pass_through_every_stage(self):
+        stages = [Stage("double", lambda n: n * 2, workers=3), Stage("inc", lambda n: n + 1, workers=2)]
+        results = list(run_stages(range(10), stages, buffer_size=2))
+        self.assertEqual(sorted(r.item for r in results), [n * 2 + 1 for n in range(10)])
+        self.assertTrue(all(r.error is None and r.stage is None for r in results))
+
+    def test_a_failing_item_skips_later_stages(self):
+        later = []
+
+        def check(n):
+            if n == 2:
+                raise ValueError("corrupt")
+            return n
+
+        def record(n):
+            later.append(n)
+            return n
+
+        with self.assertLogs("organizer.pipeline", "ERROR"):
+            results = {r.item: r for r in run_stages(range(4), [Stage("check", check), Stage("record", record)])}
+        self.assertEqual((results[2].error, results[2].stage), ("corrupt", "check"))
+        self.assertNotIn(2, later)
+        self.assertIsNone(results[3].error)
+
+    def test_first_results_arrive_while_the_source_is_still_producing(self):
+        release = threading.Event()
+
+        def items():
+            yield 1
+            release.wait(5)  # only continues once the first result was seen
+            yield 2
+
+        results = run_stages(items(), [Stage("noop", lambda n: n)])
+        self.assertEqual(next(results).item, 1)
+        release.set()
+        self.assertEqual([r.item for r in results], [2])
+
+    def test_source_errors_are_raised_after_draining(self):
+        def items():
+            yield 1
+            raise OSError("input vanished")
+
+        seen = []
+        with self.assertRaises(OSError):
+            for result in run_stages(items(), [Stage("noop", lambda n: n, workers=2)]):
+                seen.append(result.item)
+        self.assertEqual(seen, [1])
+
+    def test_stages_run_with_their_worker_counts(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def busy(n):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return n
+
+        list(run_stages(range(12), [Stage("busy", busy, workers=3)], buffer_size=12))
+        self.assertEqual(peak[0], 3)
@@ -0,0 +1,64 @@
+import unittest
+
+from organizer.rate_limit import MemoryStore, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MemoryStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = MemoryStore(clock=self.clock)
+
+    def test_burst_is_free_then_callers_queue_at_the_rate(self):
+        waits = [self.store.reserve("p", rate=2.0, burst=2.0) for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+
+    def test_tokens_refill_with_time_up_to_the_burst(self):
+        for _ in range(2):
+            self.store.reserve("p", rate=1.0, burst=2.0)
+        self.clock.now += 100
+        waits = [self.store.reserve("p", rate=1.0, burst=2.0) for _ in range(3)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0])
+
+    def test_buckets_are_per_key(self):
+        self.store.reserve("a", rate=1.0, burst=1.0)
+        self.assertEqual(self.store.reserve("b", rate=1.0, burst=1.0), 0.0)
+        self.assertEqual(self.store.reserve("a", rate=1.0, burst=1.0), 1.0)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.slept = []
+        self.limiter = RateLimiter(
+            {"google_books": 1.0, "off": 0},
+            store=MemoryStore(clock=FakeClock()),
+            sleep=self.slept.append,
+        )
+
+    def test_sleeps_for_the_reserved_wait(self):
+        self.assertEqual(self.limiter.acquire("google_books"), 0.0)
+        self.assertEqual(self.limiter.acquire("google_books"), 1.0)
+        self.assertEqual(self.slept, [1.0])
+
+    def test_unconfigured_and_zero_rates_are_not_limited(self):
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire("off"), 0.0)
+            self.assertEqual(self.limiter.acquire("other"), 0.0)
+        self.assertEqual(self.slept, [])
+
+    def test_store_failure_degrades_to_unpaced(self):
+        class Broken:
+            def reserve(self, *args):
+                raise ConnectionError("redis down")
+
+        limiter = RateLimiter({"p": 1.0}, store=Broken(), sleep=self.slept.append)
+        with self.assertLogs("organizer.rate_limit", "WARNING"):
+            self.assertEqual(limiter.acquire("p"), 0.0)
+        self.assertEqual(self.slept, [])
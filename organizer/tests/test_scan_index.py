@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from organizer.scan_index import Fingerprint, ScanIndex
+from organizer.utils import iter_book_candidates
+
+
+class ScanIndexTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.db = os.path.join(self.dir, "state", "scan_index.sqlite3")
+
+    def test_file_entries_hit_only_while_the_fingerprint_matches(self):
+        fp = Fingerprint(size=10, mtime_ns=1, inode=5)
+        with ScanIndex(self.db) as index:
+            index.put_file("/in/a.mp3", fp, {"album": "Book"}, "d1")
+        with ScanIndex(self.db) as index:
+            self.assertEqual(index.get_file("/in/a.mp3", fp), (True, {"album": "Book"}, "d1"))
+            self.assertEqual(index.get_file("/in/a.mp3", Fingerprint(11, 1, 5)), (False, None, None))
+            self.assertEqual((index.hits, index.misses), (1, 1))
+
+    def test_moved_files_are_found_by_inode(self):
+        fp = Fingerprint(size=10, mtime_ns=1, inode=5)
+        with ScanIndex(self.db) as index:
+            index.put_file("/in/a.mp3", fp, None, "d1")
+            self.assertEqual(index.get_file("/in/group/a.mp3", fp), (True, None, "d1"))
+
+    def test_directory_listings_are_reused_while_the_mtime_matches(self):
+        with ScanIndex(self.db) as index:
+            index.put_listing("/in/Book", 7, ["/in/Book/CD1"], ["/in/Book/01.mp3"])
+            self.assertEqual(index.get_listing("/in/Book", 7), (["/in/Book/CD1"], ["/in/Book/01.mp3"]))
+            self.assertIsNone(index.get_listing("/in/Book", 8))
+
+    def test_prune_drops_entries_not_seen_by_the_latest_scan(self):
+        fp = Fingerprint(size=10, mtime_ns=1, inode=5)
+        with ScanIndex(self.db) as index:
+            index.put_file("/in/a.mp3", fp, None)
+            index.put_file("/in/b.mp3", Fingerprint(10, 1, 6), None)
+            index.put_file("/other/c.mp3", Fingerprint(10, 1, 7), None)
+        with ScanIndex(self.db) as index:
+            index.get_file("/in/a.mp3", fp)
+            index.prune("/in")
+        with ScanIndex(self.db) as index:
+            self.assertTrue(index.get_file("/in/a.mp3", fp)[0])
+            self.assertFalse(index.get_file("/in/b.mp3", Fingerprint(10, 1, 6))[0])
+            self.assertTrue(index.get_file("/other/c.mp3", Fingerprint(10, 1, 7))[0])
+
+    def test_rescanning_an_unchanged_tree_reads_no_file(self):
+        root = os.path.join(self.dir, "input")
+        os.makedirs(os.path.join(root, "Book"))
+        for name in ("01.mp3", "02.mp3"):
+            with open(os.path.join(root, "Book", name), "wb") as fh:
+                fh.write(name.encode() * 100)
+        with ScanIndex(self.db) as index:
+            first = [c.content_digest for c in iter_book_candidates(root, index=index)]
+            self.assertEqual(index.misses, 2)
+        with ScanIndex(self.db) as index:
+            second = [c.content_digest for c in iter_book_candidates(root, index=index)]
+            self.assertEqual((index.hits, index.misses), (2, 0))
+        self.assertEqual(first, second)
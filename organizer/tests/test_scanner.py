@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from mutagen.id3 import ID3, TALB, TPE1, TRCK
+
+from organizer.utils import candidate_hints, iter_book_candidates, iter_unique_candidates
+
+AUDIO = b"\xff\xfb\x90\x00" + b"\x00" * 400
+
+
+class ScannerTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / "input"
+        self.root.mkdir()
+
+    def mp3(self, rel, artist=None, album=None, track=None):
+        """A fake MP3 that, like ffmpeg/LAME output, always has an ID3 header."""
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(AUDIO + rel.encode())  # distinct contents per file
+        tags = ID3()
+        if artist:
+            tags.add(TPE1(encoding=3, text=artist))
+        if album:
+            tags.add(TALB(encoding=3, text=album))
+        if track:
+            tags.add(TRCK(encoding=3, text=track))
+        tags.save(str(path))
+        return path
+
+    def scan(self):
+        candidates = list(iter_book_candidates(str(self.root), tag_readers=4))
+        return {c.source_dir.name: sorted(f.path.name for f in c.files) for c in candidates}, candidates
+
+    def assert_nothing_lost(self, candidates, count):
+        files = [f.path for c in candidates for f in c.files]
+        self.assertEqual(len(files), count)
+        self.assertTrue(all(f.exists() for f in files))
+        self.assertNotIn(self.root, [c.source_dir for c in candidates])
+
+    def test_untagged_folder_is_one_book(self):
+        for i in (1, 2, 10):
+            self.mp3(f"Auth - Book/Track {i}.mp3")
+        books, candidates = self.scan()
+        self.assertEqual(books, {"Auth - Book": ["Track 1.mp3", "Track 10.mp3", "Track 2.mp3"]})
+        self.assertEqual(candidate_hints(candidates[0]), ("Auth", "Book"))
+
+    def test_tagged_book_stays_in_its_folder(self):
+        for i in (1, 2):
+            self.mp3(f"Some Folder/{i:02d}.mp3", artist="Jane Doe", album="The Book", track=str(i))
+        books, candidates = self.scan()
+        self.assertEqual(books, {"Some Folder": ["01.mp3", "02.mp3"]})
+        self.assertEqual(candidate_hints(candidates[0]), ("Jane Doe", "The Book"))
+        self.assertEqual(sorted(f.track_number for f in candidates[0].files), [1, 2])
+
+    def test_books_sharing_a_folder_get_their_own_folders(self):
+        self.mp3("C/one.mp3", artist="A", album="One")
+        self.mp3("C/two.mp3", artist="A", album="Two")
+        books, candidates = self.scan()
+        self.assertEqual(sorted(books.values()), [["one.mp3"], ["two.mp3"]])
+        self.assertNotIn("C", books)
+        self.assertEqual(sorted(candidate_hints(c) for c in candidates), [("A", "One"), ("A", "Two")])
+        self.assert_nothing_lost(candidates, 2)
+
+    def test_loose_files_are_moved_out_of_the_input_root(self):
+        self.mp3("Jane Doe - Loose Book.mp3")
+        self.mp3("Bob - Flat 01.mp3")
+        self.mp3("Bob - Flat 02.mp3")
+        books, candidates = self.scan()
+        self.assertEqual(sorted(books.values()), [["Bob - Flat 01.mp3", "Bob - Flat 02.mp3"], ["Jane Doe - Loose Book.mp3"]])
+        self.assertEqual(sorted(candidate_hints(c) for c in candidates), [("Bob", "Flat"), ("Jane Doe", "Loose Book")])
+        self.assert_nothing_lost(candidates, 3)
+
+    def test_junk_is_deleted(self):
+        self.mp3("Book/01.mp3")
+        (self.root / "Book" / "cover.txt").write_text("junk")
+        self.scan()
+        self.assertEqual(os.listdir(self.root / "Book"), ["01.mp3"])
+
+    def test_folder_holding_another_book_below_it_is_not_kept_in_place(self):
+        for name in ("q1", "q2"):
+            self.mp3(f"A/{name}.mp3", artist="W", album="Q")
+        for name in ("r1", "r2"):
+            self.mp3(f"A/Sub/{name}.mp3", artist="W", album="R")
+        books, candidates = self.scan()
+        self.assertEqual(books.pop("Sub"), ["r1.mp3", "r2.mp3"])
+        self.assertEqual(list(books.values()), [["q1.mp3", "q2.mp3"]])
+        self.assertNotIn("A", books)
+        self.assert_nothing_lost(candidates, 4)
+
+    def test_discs_with_the_same_file_names_are_merged(self):
+        for disc in ("CD1", "CD2"):
+            for i in (1, 2):
+                self.mp3(f"Book/{disc}/{i:02d}.mp3", artist="A", album="Book", track=str(i))
+        books, candidates = self.scan()
+        self.assertEqual(list(books.values()), [["CD1 - 01.mp3", "CD1 - 02.mp3", "CD2 - 01.mp3", "CD2 - 02.mp3"]])
+        self.assertEqual(candidate_hints(candidates[0]), ("A", "Book"))
+        self.assert_nothing_lost(candidates, 4)
+
+    def test_untagged_discs_still_group_after_renaming(self):
+        for disc in ("Disc 1", "Disc 2"):
+            for i in (1, 2):
+                self.mp3(f"Top/{disc}/Auth - Book {i:02d}.mp3")
+        self.mp3("Top/Disc 2/Other.mp3")
+        books, candidates = self.scan()
+        renamed = [b for b in books.values() if len(b) == 4]
+        self.assertEqual(renamed, [["Auth - Book Disc 1 01.mp3", "Auth - Book Disc 1 02.mp3",
+                                    "Auth - Book Disc 2 01.mp3", "Auth - Book Disc 2 02.mp3"]])
+        self.assert_nothing_lost(candidates, 5)
+
+        rescanned, _ = self.scan()
+        self.assertIn(renamed[0], list(rescanned.values()))
+
+    def test_copies_of_a_book_share_a_digest_and_are_archived(self):
+        output = self.root.parent / "output"
+        for folder in ("Book", "Book (copy)"):
+            for i in (1, 2):
+                path = self.mp3(f"{folder}/{i:02d}.mp3", artist="A", album="Book")
+                path.write_bytes(AUDIO * i)  # same contents in both folders
+        skipped = []
+        unique = list(iter_unique_candidates(
+            iter_book_candidates(str(self.root)), output, on_duplicate=lambda c, o: skipped.append(c),
+        ))
+        self.assertEqual(len(unique), 1)
+        self.assertEqual(len(skipped), 1)
+        self.assertEqual(skipped[0].content_digest, unique[0].content_digest)
+        archived = output / "archive" / "duplicates" / skipped[0].source_dir.name
+        self.assertEqual(sorted(os.listdir(archived)), ["01.mp3", "02.mp3", "undo.log"])
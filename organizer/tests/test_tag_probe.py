@@ -0,0 +1,112 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from mutagen.id3 import APIC, ID3, TALB, TPE1, TPOS, TRCK
+
+from organizer.tag_probe import TagProbeError, probe_tags
+
+AUDIO = b"\xff\xfb\x90\x00" + b"\x00" * 400  # stand-in MPEG frame data
+
+
+def syncsafe(n):
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+
+def id3v23(frames, flags=0):
+    body = b"".join(
+        fid + struct.pack(">I", len(data) + 1) + b"\x00\x00" + b"\x00" + data
+        for fid, data in frames
+    )
+    return b"ID3\x03\x00" + bytes([flags]) + syncsafe(len(body) + 16) + body + b"\x00" * 16
+
+
+def id3v22(frames):
+    body = b"".join(
+        fid + (len(data) + 1).to_bytes(3, "big") + b"\x00" + data for fid, data in frames
+    )
+    return b"ID3\x02\x00\x00" + syncsafe(len(body)) + body
+
+
+def atom(kind, payload):
+    return struct.pack(">I", len(payload) + 8) + kind + payload
+
+
+def ilst_item(kind, payload, data_type=1):
+    return atom(kind, atom(b"data", struct.pack(">I", data_type) + b"\x00" * 4 + payload))
+
+
+def mp4(items, full_meta=True):
+    hdlr = atom(b"hdlr", b"\x00" * 8 + b"mdirappl" + b"\x00" * 9)
+    meta = atom(b"meta", (b"\x00" * 4 if full_meta else b"") + hdlr + atom(b"ilst", b"".join(items)))
+    moov = atom(b"moov", atom(b"mvhd", b"\x00" * 100) + atom(b"udta", meta))
+    return atom(b"ftyp", b"M4B \x00\x00\x02\x00isomM4B ") + moov + atom(b"mdat", b"\x00" * 64)
+
+
+class TagProbeTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return path
+
+    def test_id3v23_frames(self):
+        path = self.write("a.mp3", id3v23([
+            (b"TIT2", b"Ignored"), (b"TPE1", b"Author"), (b"TALB", b"Book"),
+            (b"TRCK", b"3/12"), (b"TPOS", b"1"),
+        ]) + AUDIO)
+        self.assertEqual(probe_tags(path), {"artist": "Author", "album": "Book", "track": "3/12", "disc": "1"})
+
+    def test_id3v22_frames(self):
+        path = self.write("a.mp3", id3v22([(b"TP1", b"Author"), (b"TAL", b"Book")]) + AUDIO)
+        self.assertEqual(probe_tags(path), {"artist": "Author", "album": "Book", "track": None, "disc": None})
+
+    def test_matches_mutagen_written_id3v24_with_a_cover(self):
+        path = self.write("a.mp3", AUDIO)
+        tags = ID3()
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=b"\xff" * 50000))
+        tags.add(TPE1(encoding=1, text="Auteur é"))
+        tags.add(TALB(encoding=3, text=["Livre", "Second"]))
+        tags.add(TRCK(encoding=0, text="07"))
+        tags.add(TPOS(encoding=0, text="2/2"))
+        tags.save(path, v2_version=4)
+        self.assertEqual(probe_tags(path), {"artist": "Auteur é", "album": "Livre", "track": "07", "disc": "2/2"})
+
+    def test_header_without_frames_is_all_none(self):
+        path = self.write("a.mp3", id3v23([]) + AUDIO)
+        self.assertEqual(probe_tags(path), {"artist": None, "album": None, "track": None, "disc": None})
+
+    def test_mp3_without_id3_is_none(self):
+        self.assertIsNone(probe_tags(self.write("a.mp3", AUDIO)))
+
+    def test_unsynchronised_tag_is_left_to_mutagen(self):
+        path = self.write("a.mp3", id3v23([(b"TPE1", b"Author")], flags=0x80) + AUDIO)
+        with self.assertRaises(TagProbeError):
+            probe_tags(path)
+
+    def test_unknown_container_raises(self):
+        with self.assertRaises(TagProbeError):
+            probe_tags(self.write("a.m4a", b"RIFF" + b"\x00" * 100))
+
+    def test_mp4_items_skip_the_cover(self):
+        path = self.write("a.m4b", mp4([
+            ilst_item(b"covr", b"\xff" * 50000, data_type=13),
+            ilst_item(b"\xa9ART", "Autor".encode()),
+            ilst_item(b"\xa9alb", b"Book"),
+            ilst_item(b"trkn", struct.pack(">HHHH", 0, 4, 10, 0), data_type=0),
+            ilst_item(b"disk", struct.pack(">HHH", 0, 1, 2), data_type=0),
+        ]))
+        self.assertEqual(probe_tags(path), {"artist": "Autor", "album": "Book", "track": "4", "disc": "1"})
+
+    def test_quicktime_meta_without_full_box_header(self):
+        path = self.write("a.m4a", mp4([ilst_item(b"\xa9alb", b"Book")], full_meta=False))
+        self.assertEqual(probe_tags(path)["album"], "Book")
+
+    def test_mp4_without_metadata_is_all_none(self):
+        data = atom(b"ftyp", b"M4A \x00\x00\x00\x00") + atom(b"moov", atom(b"mvhd", b"\x00" * 100))
+        self.assertEqual(probe_tags(self.write("a.m4a", data)), dict.fromkeys(("artist", "album", "track", "disc")))
@@ -0,0 +1,68 @@
+import os
+import unittest
+from unittest import mock
+
+if not os.environ.get("DJANGO_SETTINGS_MODULE"):
+    raise unittest.SkipTest("Django-side tests run with `python manage.py test`")
+
+from django.test import TestCase
+from django.urls import reverse
+
+from organizer import views
+from organizer.models import Job, Log
+
+
+class LogsViewTests(TestCase):
+    def setUp(self):
+        self.job = Job.objects.create(input_path="/input", output_path="/output", status="processing")
+        other = Job.objects.create(input_path="/input", output_path="/output")
+        self.rows = []
+        for i in range(5):
+            self.rows.append(Log.objects.create(job=self.job, message=f"line {i}", book="Book", stage="convert"))
+            Log.objects.create(job=other, message=f"other {i}")
+        self.url = reverse("logs", args=[self.job.id])
+
+    def get(self, status=200, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_first_page_has_every_row_of_the_job(self):
+        data = self.get()
+        self.assertEqual([row["message"] for row in data["logs"]], [f"line {i}" for i in range(5)])
+        self.assertEqual(data["logs"][0]["book"], "Book")
+        self.assertEqual(data["last_id"], self.rows[-1].id)
+        self.assertFalse(data["has_more"])
+        self.assertEqual(data["status"], "processing")
+
+    def test_pages_follow_the_cursor(self):
+        first = self.get(limit=2)
+        self.assertEqual([row["id"] for row in first["logs"]], [r.id for r in self.rows[:2]])
+        self.assertTrue(first["has_more"])
+        second = self.get(after_id=first["last_id"], limit=3)
+        self.assertEqual([row["id"] for row in second["logs"]], [r.id for r in self.rows[2:]])
+        self.assertFalse(second["has_more"])
+
+    def test_no_new_rows_keeps_the_cursor(self):
+        last_id = self.rows[-1].id
+        data = self.get(after_id=last_id)
+        self.assertEqual(data["logs"], [])
+        self.assertEqual(data["last_id"], last_id)
+
+        row = Log.objects.create(job=self.job, message="new")
+        self.assertEqual([r["id"] for r in self.get(after_id=last_id)["logs"]], [row.id])
+
+    def test_limit_is_capped(self):
+        with mock.patch.object(views, "LOGS_MAX_PAGE_SIZE", 3):
+            data = self.get(limit=100)
+        self.assertEqual(len(data["logs"]), 3)
+        self.assertTrue(data["has_more"])
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({"after_id": "x"}, {"limit": "many"}, {"limit": 0}, {"limit": -1}):
+            with self.subTest(params=params):
+                self.assertIn("error", self.get(status=400, **params))
+
+    def test_unknown_job(self):
+        data = self.client.get(reverse("logs", args=[self.job.id + 100])).json()
+        self.assertEqual(data, {"logs": [], "last_id": 0, "has_more": False, "status": None})
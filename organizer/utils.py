@@ -1,18 +1,40 @@
 import os
+import hashlib
 import subprocess
-import requests
 import re
 import zipfile
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
-from mutagen.mp4 import MP4
+from mutagen.mp4 import MP4, MP4Cover
 from mutagen.easyid3 import EasyID3
 import shutil
 import logging
+import time
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Optional
 import beets.library
 import beetsplug.audible as audible  # Assume configured
+from .enrichment import Provider, enrich_concurrently, group_queries, match_title
+from .checkpoints import BookCheckpoint, ClaimError
+from .content_hash import book_digest, file_digest
+from .cover_cache import get_cache as get_cover_cache
+from .fs_ops import move_file, move_tree
+from .http_client import get_session
+from .library_index import get_index as get_library_index
+from .metadata_cache import cached_lookup, normalize_key, normalize_text
+from .encoder_profiles import DEFAULT_PROFILE
+from .encoder_slots import encoder_slots
+from .muxer import MuxError, build_m4b
+from .rate_limit import throttle
+from .pipeline import Stage, imap_bounded
+from .scan_index import Fingerprint
+from .tag_probe import TagProbeError, probe_tags
+from .domain import AudioFile, BookCandidate, EnrichedBook, LayoutPlan
+from .filename_parsing import detect_source_format, parse_tag_number
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 def handle_uploaded_file(f):
     temp_dir = '/tmp/upload'
@@ -27,130 +49,845 @@ def handle_uploaded_file(f):
         os.remove(path)
     return temp_dir
 
-def scan_audiobook_folders(input_path):
-    candidates = []
-    all_audio = [os.path.join(root, f) for root, _, files in os.walk(input_path) for f in files if f.lower().endswith(('.mp3', '.m4a', '.m4b'))]
-    # Group flat files by common metadata or name prefix
-    groups = {}  # Key: (author, title), Value: list of files
-    for file in all_audio:
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.m4b')
+
+def read_tags(path):
+    """
+    Read the grouping-relevant tags of one audio file.
+
+    Returns a dict with artist/album/track/disc (values may be None), or
+    None if the file has no readable tags.
+
+    The header-only probe (organizer.tag_probe) is tried first; mutagen is
+    only used for files the probe cannot handle.
+    """
+    try:
+        return probe_tags(path)
+    except TagProbeError:
+        pass
+    except OSError:
+        return None
+    try:
+        if path.lower().endswith('.mp3'):
+            audio = EasyID3(path)
+            keys = {'artist': 'artist', 'album': 'album', 'track': 'tracknumber', 'disc': 'discnumber'}
+        else:
+            audio = MP4(path)
+            keys = {'artist': '\xa9ART', 'album': '\xa9alb', 'track': 'trkn', 'disc': 'disk'}
+        tags = {}
+        for name, key in keys.items():
+            value = (audio.get(key) or [None])[0]
+            if isinstance(value, tuple):  # MP4 trkn/disk are (number, total)
+                value = value[0]
+            tags[name] = str(value) if value is not None else None
+        return tags
+    except Exception:
+        return None
+
+def _list_directory(directory, index=None):
+    """
+    Return (subdirs, audio_files) for one directory, deleting junk
+    (non-audio files) on the way.
+
+    With a ScanIndex, a directory whose mtime is unchanged since the last
+    scan reuses its recorded listing instead of being listed again.
+    """
+    dir_mtime = os.stat(directory).st_mtime_ns
+    listing = index.get_listing(directory, dir_mtime) if index else None
+    if listing is not None:
+        return listing
+    subdirs, files, removed = [], [], False
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                files.append(entry.path)
+            else:
+                # Clean junk
+                os.remove(entry.path)
+                removed = True
+    if index:
+        if removed:
+            dir_mtime = os.stat(directory).st_mtime_ns
+        index.put_listing(directory, dir_mtime, subdirs, files)
+    return subdirs, files
+
+def _iter_audio_files(input_path, index=None):
+    """
+    Yield (scope, path, stat) for every audio file under input_path in a
+    single depth-first pass.
+
+    `scope` is the top-level entry of input_path the file lives under (or
+    input_path itself for loose files); all files of one scope are yielded
+    contiguously.
+    """
+    root = os.path.normpath(input_path)
+    stack = [(root, root)]
+    while stack:
+        directory, scope = stack.pop()
         try:
-            audio = EasyID3(file) if file.endswith('.mp3') else MP4(file)
-            author = audio.get('artist', 'Unknown')[0]
-            title = audio.get('album', os.path.basename(file))[0]
-            key = (author, title)
-            groups.setdefault(key, []).append(file)
-        except:
-            # Fallback to filename grouping
-            prefix = re.match(r'^(.*? - .*?)\d+', os.path.basename(file))
-            key = prefix.group(1) if prefix else os.path.basename(file)
-            groups.setdefault(key, []).append(file)
-    
+            subdirs, files = _list_directory(directory, index)
+        except OSError:
+            continue
+        for file in files:
+            try:
+                yield scope, file, os.stat(file)
+            except OSError:
+                continue
+        stack.extend((d, d if directory == root else scope) for d in reversed(subdirs))
+
+def _group_key(file, tags):
+    # Files can only be grouped by tags when they name the album; the probe
+    # returns an all-None dict for a bare ID3 header
+    if tags and tags.get('album'):
+        return (tags.get('artist') or 'Unknown', tags['album'])
+    # Fallback to filename grouping
+    prefix = re.match(r'^(.*? - .*?)\d+', os.path.splitext(os.path.basename(file))[0])
+    return prefix.group(1) if prefix else os.path.basename(file)
+
+def _key_title(key):
+    """Title hint of an untagged group key: a folder path, file name or file name prefix."""
+    if os.path.isabs(key):
+        return os.path.basename(key)
+    if key.lower().endswith(AUDIO_EXTENSIONS):
+        key = os.path.splitext(key)[0]
+    return key.strip(' -_')
+
+def _make_candidate(folder, key, files, moved=False):
+    """
+    Build a BookCandidate from (path, size, tags, digest) tuples living in
+    `folder`; `moved` means the scanner created the folder for them.
+    """
+    first_tags = next((tags for _, _, tags, _ in files if tags), None) or {}
+    if isinstance(key, tuple):
+        author_hint, title_hint = key
+    else:
+        # A generated folder name says nothing about the book
+        author_hint = first_tags.get('artist')
+        title_hint = _key_title(key) if moved else os.path.basename(folder)
+    candidate = BookCandidate(
+        id=hashlib.sha1(folder.encode()).hexdigest()[:16],
+        raw_title_hint=title_hint,
+        raw_author_hint=author_hint,
+        source_dir=Path(folder),
+        content_digest=book_digest(digest for _, _, _, digest in files),
+    )
+    for path, size, tags, _ in files:
+        tags = tags or {}
+        candidate.add_file(AudioFile(
+            path=Path(path),
+            size_bytes=size,
+            format=detect_source_format(Path(path)),
+            track_number=parse_tag_number(tags.get('track')),
+            disc_number=parse_tag_number(tags.get('disc')),
+        ))
+    return candidate
+
+def _merge_loose_files(input_path, groups):
+    """
+    Untagged files whose names share no prefix end up in a group of their
+    own. Merge those living in the same folder (other than input_path) into
+    one group for that folder, so a folder of "Track N.mp3" files stays a
+    single book.
+    """
+    merged = {}
     for key, files in groups.items():
-        if len(files) > 1:  # Likely a book
-            group_dir = os.path.join(input_path, str(hash(key)))  # Temp dir
-            os.makedirs(group_dir, exist_ok=True)
-            for f in files:
-                shutil.move(f, group_dir)
-            candidates.append(group_dir)
-        else:
-            # Single file: treat as is
-            candidates.append(os.path.dirname(files[0]))
-    
-    # Clean junk
-    for root, dirs, files in os.walk(input_path):
-        for f in files:
-            if not f.lower().endswith(('.mp3', '.m4a', '.m4b')):
-                os.remove(os.path.join(root, f))
-    
-    return candidates
+        directory = os.path.dirname(files[0][0])
+        if not isinstance(key, tuple) and len(files) == 1 and directory != input_path:
+            key = directory
+        merged.setdefault(key, []).extend(files)
+    return merged
+
+def _disambiguated_name(path, key, taken):
+    """
+    A name for `path` in a group folder that does not clash with `taken`,
+    e.g. "CD1 - 01.mp3" for "CD1/01.mp3". The source folder name goes after
+    an untagged group's filename prefix, so the files still group together
+    and sort by disc.
+    """
+    name = os.path.basename(path)
+    folder = os.path.basename(os.path.dirname(path))
+    if isinstance(key, str) and not os.path.isabs(key) and name.startswith(key) and name != key:
+        name = f"{key}{folder} {name[len(key):]}"
+    else:
+        name = f"{folder} - {name}"
+    base, ext = os.path.splitext(name)
+    n = 2
+    while name in taken:
+        name = f"{base} ({n}){ext}"
+        n += 1
+    return name
+
+def _finish_scope(input_path, scope, groups):
+    """
+    Build candidates for one scope's groups. A group that already has a
+    folder to itself (no other group's files in it or below it) is left in
+    place; every other group (including loose files in input_path) is
+    moved into its own folder under input_path.
+    """
+    groups = _merge_loose_files(input_path, groups)
+    owners = {}  # directory -> number of groups with files in it
+    for files in groups.values():
+        for directory in {os.path.dirname(f[0]) for f in files}:
+            owners[directory] = owners.get(directory, 0) + 1
+    for key, files in groups.items():
+        dirs = {os.path.dirname(f[0]) for f in files}
+        if len(dirs) == 1:
+            (directory,) = dirs
+            # Archiving the folder moves its subfolders along, so it must not hold other books
+            nested = any(d.startswith(directory + os.sep) for d in owners)
+            if directory != input_path and owners[directory] == 1 and not nested:
+                yield _make_candidate(directory, key, files)
+                continue
+        # Stable name so re-runs land in the same folder (builtin hash() is salted per process);
+        # the scope keeps equally-tagged copies in different folders apart
+        name = repr((os.path.relpath(scope, input_path), key))
+        group_dir = os.path.join(input_path, hashlib.sha1(name.encode()).hexdigest()[:16])
+        os.makedirs(group_dir, exist_ok=True)
+        counts = {}
+        for path, _, _, _ in files:
+            counts[os.path.basename(path)] = counts.get(os.path.basename(path), 0) + 1
+        taken = set(os.listdir(group_dir))
+        placed = []
+        for path, size, tags, digest in files:
+            if os.path.dirname(path) != group_dir:
+                name = os.path.basename(path)
+                if counts[name] > 1 or name in taken:
+                    name = _disambiguated_name(path, key, taken)
+                dest = os.path.join(group_dir, name)
+                shutil.move(path, dest)
+                taken.add(name)
+                path = dest
+            placed.append((path, size, tags, digest))
+        yield _make_candidate(group_dir, key, placed, moved=True)
+
+def iter_book_candidates(input_path, index=None, tag_readers=8):
+    """
+    Scan input_path and yield BookCandidates as soon as they are complete.
+
+    Discovery, tag reading and grouping form one streaming pass: files are
+    listed with os.scandir, tags are read on up to `tag_readers` threads,
+    and grouping happens per top-level folder of input_path (loose files in
+    input_path form their own scope). As soon as every file of a scope has
+    its tags, that scope's groups are moved into place and yielded, so
+    callers can start converting while the rest of the tree is scanned.
+    Junk (non-audio) files are deleted while listing.
+
+    Each file also gets a sampled content digest (organizer.content_hash),
+    combined into BookCandidate.content_digest for duplicate detection.
+
+    `index` is an optional organizer.scan_index.ScanIndex; when given, tags
+    and digests are only recomputed for files whose size/mtime/inode
+    changed since the previous scan. Every audio file ends up in exactly
+    one candidate, and no candidate folder is input_path itself.
+    """
+    root = os.path.normpath(input_path)
+    scopes = {}  # scope -> {'expected', 'received', 'discovered', 'groups'}
+    current = []
+
+    def discover():
+        for scope, file, st in _iter_audio_files(root, index):
+            if not current or current[0] != scope:
+                if current:
+                    scopes[current[0]]['discovered'] = True
+                current[:] = [scope]
+                scopes[scope] = {'expected': 0, 'received': 0, 'discovered': False, 'groups': {}}
+            scopes[scope]['expected'] += 1
+            fp = Fingerprint.from_stat(st)
+            hit, tags, digest = index.get_file(file, fp) if index else (False, None, None)
+            yield scope, file, st.st_size, fp, hit, tags, digest
+        if current:
+            scopes[current[0]]['discovered'] = True
+
+    def resolve(item):
+        _, file, size, _, hit, tags, digest = item
+        if not hit:
+            tags = read_tags(file)
+        return tags, digest or file_digest(file, size)
+
+    def finished():
+        done = [s for s, state in scopes.items() if state['discovered'] and state['received'] == state['expected']]
+        for scope in done:
+            yield from _finish_scope(root, scope, scopes.pop(scope)['groups'])
+
+    for (scope, file, size, fp, hit, _, cached_digest), (tags, digest) in imap_bounded(resolve, discover(), tag_readers):
+        if index and (not hit or digest != cached_digest):
+            index.put_file(file, fp, tags, digest)
+        state = scopes[scope]
+        state['received'] += 1
+        # Group flat files by common metadata or name prefix
+        state['groups'].setdefault(_group_key(file, tags), []).append((file, size, tags, digest))
+        yield from finished()
+    yield from finished()
+    if index:
+        index.prune(root)
+
+def scan_audiobook_folders(input_path, index=None, tag_readers=8):
+    """
+    Group the audio files under input_path into candidate book folders.
+
+    List-returning wrapper around iter_book_candidates, kept for callers
+    that want every folder up front.
+    """
+    return [str(c.source_dir) for c in iter_book_candidates(input_path, index, tag_readers)]
 
+@cached_lookup('google_books', fallback={})
 def fetch_metadata_google_books(title, author):
-    try:
-        query = quote_plus(f"{title} {author}")
-        url = f"https://www.googleapis.com/books/v1/volumes?q={query}"
-        response = requests.get(url)
-        data = response.json()
-        if data['totalItems'] > 0:
-            item = data['items'][0]['volumeInfo']
-            return {
-                'title': item.get('title'),
-                'author': item.get('authors', ['Unknown'])[0],
-                'series': item.get('seriesInfo', {}).get('bookDisplayNumber', ''),  # Basic series
-                'cover': item.get('imageLinks', {}).get('thumbnail')
-            }
-    except:
-        return {}
-
-def process_audiobook_folder(folder, output_path):
-    folder_name = os.path.basename(folder)
+    query = quote_plus(f"{title} {author}")
+    url = f"https://www.googleapis.com/books/v1/volumes?q={query}"
+    throttle('google_books')
+    response = get_session().get(url)
+    response.raise_for_status()
+    data = response.json()
+    if data['totalItems'] > 0:
+        return _google_volume(data['items'][0]['volumeInfo'])
+    return {}
+
+def _google_volume(item):
+    return {
+        'title': item.get('title'),
+        'author': item.get('authors', ['Unknown'])[0],
+        'series': item.get('seriesInfo', {}).get('bookDisplayNumber', ''),  # Basic series
+        'cover': item.get('imageLinks', {}).get('thumbnail')
+    }
+
+@cached_lookup('google_books_author', fallback=[])
+def _google_books_by_author(_title, author):
+    query = quote_plus(f'inauthor:"{author}"')
+    url = f"https://www.googleapis.com/books/v1/volumes?q={query}&maxResults=40"
+    throttle('google_books')
+    response = get_session().get(url)
+    response.raise_for_status()
+    return [_google_volume(i['volumeInfo']) for i in response.json().get('items', [])]
+
+def fetch_author_volumes_google_books(author):
+    """Up to 40 Google Books volumes by `author`, for matching many titles at once."""
+    return _google_books_by_author(None, author)
+
+@cached_lookup('audible_asin')
+def find_asin(title, author=None):
+    if author and author != 'Unknown':
+        query = quote_plus(f"{title} {author} audiobook")
+    else:
+        query = quote_plus(f"{title} audiobook")
+    url = f"https://www.audible.com/search?keywords={query}"
+    throttle('audible_asin')
+    response = get_session().get(url)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    first_link = soup.find('a', class_='bc-link', href=lambda h: h and '/pd/' in h)
+    if first_link:
+        return first_link['href'].split('/')[-1].split('?')[0]
+    return None
+
+@cached_lookup('openlibrary_cover')
+def fetch_cover_url(title, author):
+    query = quote_plus(f"{title} {author}")
+    url = f"https://openlibrary.org/search.json?q={query}"
+    throttle('openlibrary_cover')
+    response = get_session().get(url)
+    response.raise_for_status()
+    data = response.json()
+    if data['num_found'] > 0:
+        olid = data['docs'][0].get('cover_edition_key')
+        if olid:
+            return f"https://covers.openlibrary.org/b/olid/{olid}-L.jpg"
+    return None
+
+def _hints_from_folder_name(folder_name):
     parts = folder_name.split(' - ')
     author = parts[0].strip() if len(parts) > 1 else 'Unknown'
     title = ' - '.join(parts[1:]).strip() if len(parts) > 1 else folder_name
-    
-    # Enhanced chapter detection with regex
-    mp3_files = sorted([f for f in os.listdir(folder) if f.lower().endswith('.mp3')])
-    for i, file in enumerate(mp3_files, start=1):
-        old_path = os.path.join(folder, file)
-        match = re.match(r'(\d+) - (.*)\.mp3', file, re.I)
-        chapter_name = f"Chapter {match.group(1) if match else i:02d} - {match.group(2) if match else 'Unknown'}.mp3"
-        new_path = os.path.join(folder, chapter_name)
-        os.rename(old_path, new_path)
-        audio = EasyID3(new_path)
-        audio['title'] = chapter_name.replace('.mp3', '')
-        audio.save()
-    
-    # Metadata: Priority - Embedded > beets-audible > Audible scrape > Google Books > OpenLibrary
-    metadata = {}
+    return author, title
+
+def candidate_hints(candidate):
+    """
+    (author, title) to query providers with: an "Author - Title" folder name
+    wins, then the scanner's tag hints, then the bare folder name.
+    """
+    folder_name = os.path.basename(str(candidate.source_dir))
+    author, title = _hints_from_folder_name(folder_name)
+    if ' - ' not in folder_name and candidate.raw_author_hint:
+        author = candidate.raw_author_hint
+        title = candidate.raw_title_hint or title
+    elif ' - ' not in folder_name and candidate.raw_title_hint:
+        author, title = _hints_from_folder_name(candidate.raw_title_hint)
+    return author, title
+
+def candidate_from_folder(folder):
+    """Minimal BookCandidate for a folder that did not come from the scanner."""
+    return BookCandidate(
+        id=hashlib.sha1(folder.encode()).hexdigest()[:16],
+        raw_title_hint=os.path.basename(folder),
+        source_dir=Path(folder),
+    )
+
+def _lookup_beets(folder, title, author):
+    lib = beets.library.Library(':memory:')
+    item = lib.add(folder)  # Simplified
+    throttle('audible_api')
+    audible.fetch_db(item)  # From beets-audible
+    return {'title': item.title, 'author': item.artist, 'series': item.series, 'asin': item.asin}
+
+def _lookup_google_books(folder, title, author):
+    return fetch_metadata_google_books(title, author)
+
+def _lookup_asin(folder, title, author):
+    return {'asin': find_asin(title, author)}
+
+def _lookup_cover(folder, title, author):
+    return {'cover': fetch_cover_url(title, author)}
+
+# Priority order: beets-audible > Google Books > Audible search > OpenLibrary
+METADATA_PROVIDERS = [
+    Provider('beets-audible', _lookup_beets, timeout=30.0),
+    Provider('google-books', _lookup_google_books, timeout=15.0),
+    Provider('audible-search', _lookup_asin, timeout=15.0, primary=False, fields=frozenset({'asin'})),
+    Provider('openlibrary', _lookup_cover, timeout=15.0, primary=False, fields=frozenset({'cover'})),
+]
+
+def _enriched(candidate, metadata, author, title):
+    extra = {k: metadata[k] for k in ('asin', 'cover') if metadata.get(k)}
+    return EnrichedBook(
+        candidate=candidate,
+        title=metadata.get('title') or title,
+        author=metadata.get('author') or author,
+        series=metadata.get('series') or None,
+        extra_metadata=extra,
+    )
+
+def book_metadata(book):
+    """JSON-friendly metadata of an EnrichedBook (inverse of enrich_book's input)."""
+    return {'title': book.title, 'author': book.author, 'series': book.series, **book.extra_metadata}
+
+def enrich_book(candidate, providers=None, metadata=None):
+    """
+    Look up metadata for a candidate and return an EnrichedBook.
+
+    All providers (METADATA_PROVIDERS by default) are queried concurrently
+    via organizer.enrichment; the highest-priority answer wins, falling
+    back to the candidate hints. Pass `metadata` (e.g. from enrich_books)
+    to skip the lookups.
+    """
+    folder = str(candidate.source_dir)
+    author, title = candidate_hints(candidate)
+
+    if metadata is None:
+        metadata = enrich_concurrently(folder, title, author, providers or METADATA_PROVIDERS)
+    return _enriched(candidate, metadata, author, title)
+
+def enrich_books(candidates, providers=None, workers=8):
+    """
+    Enrich a whole library in one pass and return EnrichedBooks in the same
+    order as `candidates`.
+
+    Identical (title, author) queries are looked up once. Authors with two
+    or more distinct titles get a single author-level Google Books query
+    whose volumes are matched to their titles locally, replacing one
+    Google query per book. The other providers still run per distinct work.
+    """
+    providers = providers or METADATA_PROVIDERS
+    candidates = list(candidates)
+    hints = [candidate_hints(c) for c in candidates]
+
+    representative = {}  # normalized key -> first candidate with that query
+    for candidate, (author, title) in zip(candidates, hints):
+        representative.setdefault(normalize_key(title, author), candidate)
+
+    author_volumes = {}
+    for _, queries in group_queries((t, a) for a, t in hints).items():
+        author = queries[0][1]
+        if len(queries) > 1 and author and author != 'Unknown':
+            author_volumes[normalize_text(author)] = fetch_author_volumes_google_books(author)
+
+    def resolve(item):
+        _, candidate = item
+        author, title = candidate_hints(candidate)
+        volumes = author_volumes.get(normalize_text(author))
+        chosen = providers
+        if volumes is not None:
+            match = match_title(title, volumes)
+            if match:
+                chosen = [
+                    Provider(p.name, lambda *_: match, p.timeout, p.primary, p.fields)
+                    if p.name == 'google-books' else p
+                    for p in providers
+                ]
+        return enrich_concurrently(str(candidate.source_dir), title, author, chosen)
+
+    results = {key: meta for (key, _), meta in imap_bounded(resolve, representative.items(), workers)}
+    logger.info("Enriched %d books with %d distinct lookups and %d author queries",
+                len(candidates), len(representative), len(author_volumes))
+    return [
+        _enriched(c, results[normalize_key(t, a)], a, t)
+        for c, (a, t) in zip(candidates, hints)
+    ]
+
+def enrich_job(job):
+    """Batch-enrich every candidate of a domain Job into job.enriched_books."""
+    job.enriched_books = enrich_books(job.candidates)
+    return job.enriched_books
+
+def plan_layout(book, output_path, encoder_profile=DEFAULT_PROFILE):
+    """Decide where an EnrichedBook ends up: output/Author/[Series/]Title/Author - Title.m4b"""
+    output_root = Path(output_path)
+    output_dir = output_root / book.author / (book.series or '') / book.title
+    return LayoutPlan(
+        enriched_book=book,
+        output_root=output_root,
+        output_dir=output_dir,
+        output_file=output_dir / f"{book.author} - {book.title}.m4b",
+        encoder_profile=encoder_profile or DEFAULT_PROFILE,
+    )
+
+def _staging_file(plan):
+    return str(plan.output_root / plan.output_file.name)
+
+def _converted_file(plan):
+    """Where convert_book left the M4B: staged in the output root, or already in place."""
+    staging = _staging_file(plan)
+    return staging if os.path.exists(staging) else str(plan.output_file)
+
+def convert_book(plan, segment_workers=1):
+    """
+    Merge the candidate's files into a single M4B.
+
+    The built-in ffmpeg muxer (organizer.muxer.build_m4b) is tried first,
+    transcoding up to `segment_workers` files in parallel; it writes straight
+    to plan.output_file through a temporary file that is renamed into place.
+    If it fails, m4b-merge is used when an ASIN is known, and m4binder
+    otherwise or when m4b-merge fails too; those write to the output root
+    and place_output moves the result. Returns True on success.
+    """
+    book = plan.enriched_book
+    folder = str(book.candidate.source_dir)
+    output_file = _staging_file(plan)
+    asin = book.extra_metadata.get('asin')
+
     try:
-        lib = beets.library.Library(':memory:')
-        item = lib.add(folder)  # Simplified
-        audible.fetch_db(item)  # From beets-audible
-        metadata = {'title': item.title, 'author': item.artist, 'series': item.series, 'asin': item.asin}
-    except:
-        pass
-    
-    if not metadata.get('title'):
-        metadata = fetch_metadata_google_books(title, author)
-    
-    if not metadata.get('title'):
-        asin = find_asin(title, author)  # From previous
-        if asin:
-            metadata['asin'] = asin
-    
+        build_m4b(plan, plan.output_file, workers=segment_workers)
+        return True
+    except (MuxError, OSError) as exc:
+        logger.warning("Built-in muxer failed for %s, falling back to external tools: %s", folder, exc)
+
     success = False
-    output_file = os.path.join(output_path, f"{metadata.get('author', author)} - {metadata.get('title', title)}.m4b")
-    
-    if metadata.get('asin'):
+    if asin:
         proc = subprocess.Popen(['m4b-merge', '-i', folder, '-o', os.path.dirname(output_file)], stdin=subprocess.PIPE, text=True)
-        proc.communicate(input=metadata['asin'] + '\n')
+        proc.communicate(input=asin + '\n')
         success = proc.returncode == 0
-    
+
     if not success:
         result = subprocess.run(['python', '/opt/m4binder/m4binder.py',
                                  '--mode', 'single', '--input-folder', folder, '--output-file', output_file,
-                                 '--metadata-source', 'openlibrary', '--title', metadata.get('title', title), '--author', metadata.get('author', author)])
+                                 '--metadata-source', 'openlibrary', '--title', book.title, '--author', book.author])
         success = result.returncode == 0
-    
-    if success:
-        # Embed cover from metadata or fallback
-        cover_url = metadata.get('cover') or fetch_cover_url(metadata.get('title', title), metadata.get('author', author))
-        if cover_url:
-            embed_cover(output_file, cover_url)
-        
-        # Organize with series
-        series = metadata.get('series', '')
-        final_dir = os.path.join(output_path, metadata.get('author', author), series, metadata.get('title', title))
-        os.makedirs(final_dir, exist_ok=True)
-        shutil.move(output_file, final_dir)
-        
-        # Optional: Trigger Audiobookshelf scan (if API configured in env)
-        if os.environ.get('ABS_URL') and os.environ.get('ABS_API_KEY'):
-            requests.post(f"{os.environ['ABS_URL']}/api/libraries/scan", headers={'Authorization': os.environ['ABS_API_KEY']})
-    
+    return success
+
+def cache_cover(book):
+    """
+    Fetch the book's cover (from metadata or OpenLibrary) into the cover
+    cache and point book.cover_image_path at it, so the muxer can embed it.
+    """
+    if book.cover_image_path:
+        return book.cover_image_path
+    cover_url = book.extra_metadata.get('cover') or fetch_cover_url(book.title, book.author)
+    book.cover_image_path = get_cover_cache().fetch(cover_url)
+    return book.cover_image_path
+
+def add_cover(plan):
+    """
+    Embed the cached cover into the converted file if conversion did not
+    already do so (the m4b-merge/m4binder fallbacks). This rewrites the
+    whole file, so the built-in muxer embeds covers during the mux instead.
+    """
+    converted = _converted_file(plan)
+    cover = plan.enriched_book.cover_image_path
+    try:
+        audio = MP4(converted)
+        if audio.tags is not None and audio.tags.get('covr'):
+            return
+        if not cover or not os.path.exists(cover):
+            return
+        if audio.tags is None:
+            audio.add_tags()
+        audio['covr'] = [MP4Cover(Path(cover).read_bytes(), imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+    except Exception as exc:
+        logger.warning("Could not embed cover into %s: %s", converted, exc)
+
+def place_output(plan):
+    """Move a staged file into its final folder (if needed) and notify Audiobookshelf."""
+    # Organize with series
+    staging = _staging_file(plan)
+    if os.path.exists(staging):
+        move_file(staging, plan.output_file)
+
+    # Optional: Trigger Audiobookshelf scan (if API configured in env)
+    if os.environ.get('ABS_URL') and os.environ.get('ABS_API_KEY'):
+        get_session().post(f"{os.environ['ABS_URL']}/api/libraries/scan", headers={'Authorization': os.environ['ABS_API_KEY']})
+
+def archive_source(plan, success):
+    """Move the source folder to output/archive with an undo log."""
+    folder = str(plan.enriched_book.candidate.source_dir)
+    folder_name = os.path.basename(folder)
     # Archive with undo log
-    archive_path = os.path.join(output_path, 'archive', folder_name)
-    shutil.move(folder, archive_path)
+    archive_path = os.path.join(str(plan.output_root), 'archive', folder_name)
+    if os.path.isdir(archive_path):
+        archive_path = os.path.join(archive_path, folder_name)
+    move_tree(folder, archive_path)
     with open(os.path.join(archive_path, 'undo.log'), 'w') as log:
-        log.write(f"Original files moved from {folder}\nOutput: {final_dir}")
-    
+        log.write(f"Original files moved from {folder}\nOutput: {plan.output_dir if success else 'none'}")
+
+def archive_duplicate(candidate, original, output_path):
+    """Move a duplicate copy of a book to output/archive/duplicates with an undo log."""
+    folder = str(candidate.source_dir)
+    archive_path = os.path.join(str(output_path), 'archive', 'duplicates', os.path.basename(folder))
+    if os.path.isdir(archive_path):
+        archive_path = os.path.join(archive_path, candidate.id)
+    move_tree(folder, archive_path)
+    with open(os.path.join(archive_path, 'undo.log'), 'w') as log:
+        log.write(f"Original files moved from {folder}\nDuplicate of: {original.source_dir}")
+    return archive_path
+
+def iter_unique_candidates(candidates, output_path, on_duplicate=None):
+    """
+    Yield the first candidate of each content digest and archive later
+    copies of the same book (see archive_duplicate) instead of converting
+    them again. `on_duplicate(candidate, original)` is called for each
+    copy skipped. Candidates without a digest are always yielded.
+    """
+    seen = {}
+    for candidate in candidates:
+        digest = candidate.content_digest
+        original = seen.get(digest) if digest else None
+        if original is None:
+            if digest:
+                seen[digest] = candidate
+            yield candidate
+            continue
+        logger.info("%s duplicates %s, archiving it", candidate.source_dir, original.source_dir)
+        archive_duplicate(candidate, original, output_path)
+        if on_duplicate is not None:
+            on_duplicate(candidate, original)
+
+def _enrich_step(candidate, checkpoint, metadata=None):
+    """Enrich (reusing checkpointed metadata) and cache the cover."""
+    if metadata is None and checkpoint.reached('enriched'):
+        metadata = checkpoint.data.get('metadata')
+    book = enrich_book(candidate, metadata=metadata)
+    cache_cover(book)
+    checkpoint.mark('enriched', metadata=book_metadata(book))
+    return book
+
+LIBRARY_POLICIES = ('skip', 'replace', 'version')
+
+def _placed_output(plan):
+    """
+    An M4B already in the planned folder. The library index only sees the
+    books this process finalized, so look for those of other workers too.
+    """
+    if plan.output_file.exists():
+        return plan.output_file
+    found = sorted(plan.output_dir.glob('*.m4b')) if plan.output_dir.is_dir() else []
+    return found[0] if found else None
+
+def _next_version(stem, folder, checkpoint):
+    """Claim the first free "<stem> (N).m4b" in `folder`."""
+    n = 2
+    while True:
+        target = folder / f"{stem} ({n}).m4b"
+        if not target.exists() and checkpoint.claim(target):
+            return target
+        n += 1
+
+def _set_output(plan, output_file):
+    plan.output_file, plan.output_dir = output_file, output_file.parent
+
+def _skip_book(plan, checkpoint, existing):
+    _set_output(plan, existing)
+    checkpoint.mark('finalized', output=str(existing), skipped=True)
+    return plan
+
+def _library_step(plan, checkpoint, policy):
+    """
+    Check the output library (organizer.library_index, plus the planned
+    folder on disk) for the book and apply `policy` if it is already there:
+
+    - skip: convert nothing; the book counts as finalized at the existing file
+    - version: write "Author - Title (2).m4b" (or the next free number) next to it
+    - replace: convert as usual and delete the old copy once the new one is placed
+
+    The target file is then claimed on the checkpoint. If another book (of
+    this or a concurrent job) holds it, this one is versioned under the
+    version policy, skipped if the target already exists, and otherwise
+    fails with ClaimError so it is retried once the holder is done. The
+    decision is stored on the checkpoint so a resumed book keeps it.
+    """
+    if policy not in LIBRARY_POLICIES:
+        raise ValueError(f"unknown library policy {policy!r}")
+    stem = plan.output_file.stem
+    if checkpoint.data.get('output_file'):
+        # Claims are dropped when a book fails, so a retried book claims its target again
+        _set_output(plan, Path(checkpoint.data['output_file']))
+    else:
+        book = plan.enriched_book
+        existing = get_library_index(plan.output_root).find(book.title, book.author) or _placed_output(plan)
+        if existing is not None:
+            logger.info("%s - %s is already in the library at %s (%s)", book.author, book.title, existing, policy)
+            if policy == 'skip':
+                return _skip_book(plan, checkpoint, existing)
+            if policy == 'version':
+                _set_output(plan, _next_version(stem, existing.parent, checkpoint))
+            else:
+                checkpoint.mark('enriched', replaces=str(existing))
+    if not checkpoint.claim(plan.output_file):
+        logger.info("%s is being written for another book (%s)", plan.output_file, policy)
+        if policy == 'version':
+            _set_output(plan, _next_version(stem, plan.output_dir, checkpoint))
+        elif plan.output_file.exists():
+            return _skip_book(plan, checkpoint, plan.output_file)
+        else:
+            raise ClaimError(f"{plan.output_file} is being written for another book")
+    checkpoint.mark('enriched', output_file=str(plan.output_file))
+    return plan
+
+def _release_on_error(step):
+    """Wrap a BookWork stage so a book that fails gives up its output claim."""
+    def run(work):
+        try:
+            return step(work)
+        except BaseException:
+            work.checkpoint.release()
+            raise
+    return run
+
+def _convert_step(plan, checkpoint, segment_workers):
+    """Convert unless a checkpoint shows the M4B already exists."""
+    if checkpoint.reached('finalized') or (
+            checkpoint.reached('converted') and os.path.exists(checkpoint.data.get('output') or '')):
+        logger.info("Skipping conversion of %s, output already exists", checkpoint.folder)
+        return True
+    with encoder_slots(segment_workers) as workers:
+        success = convert_book(plan, segment_workers=workers)
+    if success:
+        checkpoint.mark('converted', output=_converted_file(plan))
+    return success
+
+def _finalize_step(plan, checkpoint):
+    if checkpoint.reached('finalized'):
+        return
+    add_cover(plan)
+    place_output(plan)
+    book = plan.enriched_book
+    library = get_library_index(plan.output_root)
+    replaced = checkpoint.data.get('replaces')
+    if replaced and Path(replaced) != plan.output_file:
+        logger.info("Replacing %s with %s", replaced, plan.output_file)
+        Path(replaced).unlink(missing_ok=True)
+        library.discard(book.title, book.author, replaced)
+    library.add(book.title, book.author, plan.output_file)
+    checkpoint.mark('finalized')
+
+def _archive_step(plan, checkpoint, success):
+    archive_source(plan, success)
+    checkpoint.mark('archived', success=success)
+    checkpoint.release()
+
+def process_audiobook_folder(folder, output_path, metadata=None, segment_workers=1, encoder_profile=None,
+                             checkpoint=None, library_policy='skip'):
+    """
+    Convert and file a single candidate folder.
+
+    `metadata` (see book_metadata) skips the provider lookups, e.g. when
+    the job already enriched all books with enrich_books. `encoder_profile`
+    names an organizer.encoder_profiles profile (default: standard).
+
+    Conversion holds host-wide encoder slots (organizer.encoder_slots): up
+    to `segment_workers` of them, and the number actually granted is the
+    parallelism passed on to convert_book.
+
+    With a `checkpoint` (organizer.checkpoints.BookCheckpoint) each
+    completed stage is recorded, and stages a previous attempt finished
+    are skipped. Books already in the output library are handled according
+    to `library_policy` (see LIBRARY_POLICIES and _library_step).
+    """
+    if checkpoint is None:
+        checkpoint = BookCheckpoint(folder)
+    if checkpoint.reached('archived'):
+        return checkpoint.data.get('success', False)
+
+    candidate = candidate_from_folder(folder)
+    checkpoint.mark('scanned')
+
+    try:
+        book = _enrich_step(candidate, checkpoint, metadata)
+        plan = _library_step(plan_layout(book, output_path, encoder_profile), checkpoint, library_policy)
+        success = _convert_step(plan, checkpoint, segment_workers)
+
+        if success:
+            _finalize_step(plan, checkpoint)
+
+        _archive_step(plan, checkpoint, success)
+    except BaseException:
+        checkpoint.release()
+        raise
     return success
+
+@dataclass
+class BookWork:
+    """Per-book state handed from stage to stage by book_stages()."""
+    candidate: BookCandidate
+    plan: Optional[LayoutPlan] = None
+    success: bool = False
+    checkpoint: Optional[BookCheckpoint] = None
+    started: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        if self.checkpoint is None:
+            self.checkpoint = BookCheckpoint(self.folder)
+        self.checkpoint.mark('scanned')
+
+    @property
+    def folder(self):
+        return str(self.candidate.source_dir)
+
+    @property
+    def elapsed(self):
+        """Seconds since the book entered the pipeline."""
+        return time.monotonic() - self.started
+
+def book_stages(output_path, limits, encoder_profile=None, library_policy='skip'):
+    """
+    The per-book pipeline as organizer.pipeline Stages:
+    enrich -> convert -> cover/layout -> archive, sized by `limits`.
+
+    Feed it BookWork items (see run_stages); each stage returns the same
+    BookWork with more filled in, and records its progress on the
+    BookWork's checkpoint.
+    """
+    def enrich(work):
+        book = _enrich_step(work.candidate, work.checkpoint)
+        plan = plan_layout(book, output_path, encoder_profile)
+        work.plan = _library_step(plan, work.checkpoint, library_policy)
+        return work
+
+    def convert(work):
+        work.success = _convert_step(work.plan, work.checkpoint, limits.segment_workers)
+        return work
+
+    def layout(work):
+        if work.success:
+            _finalize_step(work.plan, work.checkpoint)
+        return work
+
+    def archive(work):
+        _archive_step(work.plan, work.checkpoint, work.success)
+        return work
+
+    return [
+        Stage('enrich', _release_on_error(enrich), workers=limits.metadata_slots),
+        Stage('convert', _release_on_error(convert), workers=limits.convert_slots),
+        Stage('layout', _release_on_error(layout), workers=limits.layout_workers),
+        Stage('archive', _release_on_error(archive), workers=limits.archive_workers),
+    ]
@@ -12,7 +12,11 @@ def index(request):
             input_path = form.cleaned_data['input_path']
             if 'upload' in request.FILES:
                 input_path = handle_uploaded_file(request.FILES['upload'])  # Extract to temp dir
-            job = Job.objects.create(input_path=input_path, output_path=form.cleaned_data['output_path'])
+            job = Job.objects.create(
+                input_path=input_path,
+                output_path=form.cleaned_data['output_path'],
+                encoder_profile=form.cleaned_data['encoder_profile'],
+            )
             process_job.delay(job.id, job.input_path, job.output_path)
             return redirect('results', job_id=job.id)
     else:
@@ -23,6 +27,34 @@ def results(request, job_id):
     job = Job.objects.get(id=job_id)
     return render(request, 'organizer/results.html', {'job': job})
 
+LOGS_PAGE_SIZE = 200
+LOGS_MAX_PAGE_SIZE = 1000
+
 def logs(request, job_id):
-    logs = Log.objects.filter(job_id=job_id).values('message', 'timestamp')
-    return JsonResponse(list(logs), safe=False)
+    """
+    A page of a job's log rows with id > ?after_id=, oldest first, at most
+    ?limit= (capped at LOGS_MAX_PAGE_SIZE) rows. Clients pass the returned
+    last_id as the next after_id to fetch only new lines.
+    """
+    try:
+        after_id = int(request.GET.get('after_id', 0))
+        limit = min(int(request.GET.get('limit', LOGS_PAGE_SIZE)), LOGS_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'after_id and limit must be integers'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    rows = list(
+        Log.objects.filter(job_id=job_id, id__gt=after_id)
+        .order_by('id')
+        .values('id', 'message', 'timestamp', 'book', 'stage', 'duration')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    status = Job.objects.filter(id=job_id).values_list('status', flat=True).first()
+    return JsonResponse({
+        'logs': rows,
+        'last_id': rows[-1]['id'] if rows else after_id,
+        'has_more': has_more,
+        'status': status,
+    })